@@ -0,0 +1,132 @@
+''' Check many independent proofs in parallel, spreading them across a
+    pool of worker processes.
+
+    `checkfiles()` checks proof files (see `prooffile`) and `checkimage()`
+    checks the proofs in an image (see `image`), each yielding a
+    `prooffile.Result` for each proof in order. The workers read the
+    proofs themselves: only the path of each file, or the path of the
+    image and a range of proof numbers, is sent to them, and processes
+    mapping the same image share its pages. Checking proofs is pure CPU
+    work and each proof is independent, so throughput should increase
+    with the number of workers up to the number of cores.
+
+    There is deliberately no way to check `Proof` objects already built
+    in this process in parallel. Sending one to a worker means encoding
+    its formulae, which costs far more than checking it here (see
+    ``tool/bench_batch.py``); check them with `prooffile.checkproof()`,
+    or save them as an image first if they are to be checked more than
+    once.
+
+    This can also be run as a command; run ``python src/batch.py --help``
+    for usage.
+'''
+
+from    image  import Image
+from    prooffile  import Result, checkfile, checkproof
+from    proof  import AXIOMS
+
+from    concurrent.futures  import ProcessPoolExecutor
+from    typing  import Iterable, Iterator, Optional, Sequence
+import  argparse, sys
+
+def _checkfile(path:str, logic:str) -> Result:
+    ''' Check the proof file at `path` with `prooffile.checkfile()`. A file
+        that can't be read or is not a well-formed proof is invalid, with
+        `Result.bad` set to `None`.
+    '''
+    try:
+        return checkfile(path, AXIOMS[logic])
+    except (OSError, ValueError) as ex:
+        return Result(False, 0, error=str(ex))
+
+def checkfiles(paths:Sequence[str], logic:str='PS',
+               workers:Optional[int]=None) -> Iterator[Result]:
+    ''' Check each of the proof files at `paths` using the axiom schema
+        ``AXIOMS[logic]`` and a pool of `workers` processes (by default,
+        one per CPU), yielding the `Result` for each in order.
+
+        If `workers` is 0 the files are checked in this process.
+    '''
+    logics = [logic] * len(paths)
+    if workers == 0:
+        yield from map(_checkfile, paths, logics)
+        return
+    #   Each file is a lot of work compared to sending its path, so we
+    #   use small chunks to keep the load on the workers balanced.
+    with ProcessPoolExecutor(workers) as pool:
+        yield from pool.map(_checkfile, paths, logics, chunksize=1)
+
+def _checkimage(path:str, start:int, stop:int) -> list[Result]:
+    ' Check proofs `start` up to `stop` of the image at `path`. '
+    with Image(path) as im:
+        return [ checkproof(im.proof(i)) for i in range(start, stop) ]
+
+def checkimage(path:str, workers:Optional[int]=None,
+               chunksize:int=64) -> Iterator[Result]:
+    ''' Check each of the proofs in the image (see `image`) at `path`,
+        using a pool of `workers` processes (by default, one per CPU),
+        yielding the `Result` for each in order. Each worker maps the
+        image and checks `chunksize` proofs at a time.
+
+        If `workers` is 0 the proofs are checked in this process.
+    '''
+    with Image(path) as im:  n = len(im)
+    starts = range(0, n, chunksize)
+    args = ([path] * len(starts), starts,
+            [ min(i + chunksize, n) for i in starts ])
+    if workers == 0:
+        for chunk in map(_checkimage, *args):  yield from chunk
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        for chunk in pool.map(_checkimage, *args):  yield from chunk
+
+def _imageresults(paths:Sequence[str], workers:Optional[int]
+                  ) -> Iterator[tuple[str, Result]]:
+    ''' The name (the path and proof number) and `Result` of each proof in
+        the images at `paths`. An image that can't be read or checked has
+        one result for the whole image, with `Result.bad` set to `None`.
+    '''
+    for path in paths:
+        try:
+            for i, r in enumerate(checkimage(path, workers)):
+                yield f'{path}[{i}]', r
+        except (OSError, ValueError) as ex:
+            yield path, Result(False, 0, error=str(ex))
+
+def main(argv:Optional[Sequence[str]]=None) -> int:
+    ''' Check the proof files (or images) given on the command line,
+        printing the result for each proof. The exit status is 0 if all
+        are valid, 1 if not.
+    '''
+    p = argparse.ArgumentParser(description='Check proof files in parallel.')
+    p.add_argument('-j', '--jobs', type=int, default=None,
+        help='number of worker processes (default: one per CPU;'
+             ' 0 to check in this process)')
+    p.add_argument('-l', '--logic', choices=sorted(AXIOMS), default='PS',
+        help='axiom schema to use (default: %(default)s)')
+    p.add_argument('-i', '--image', action='store_true',
+        help='the paths are images of proofs, each with its own axiom'
+             ' schema, rather than proof files')
+    p.add_argument('-q', '--quiet', action='store_true',
+        help='print only proofs that are not valid')
+    p.add_argument('path', nargs='+', help='proof file')
+    args = p.parse_args(argv)
+
+    if args.image:
+        results:Iterable[tuple[str, Result]] = \
+            _imageresults(args.path, args.jobs)
+    else:
+        results = zip(args.path, checkfiles(args.path, args.logic, args.jobs))
+    allvalid = True
+    for path, r in results:
+        allvalid &= r.valid
+        if r.valid:
+            if not args.quiet:  print(f'{path}: valid: ⊢ {r.assertion}')
+        elif r.bad is None:
+            print(f'{path}: error: {r.error}')
+        else:
+            print(f'{path}: invalid: step {r.bad}: {r.error}')
+    return 0 if allvalid else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
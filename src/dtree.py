@@ -0,0 +1,113 @@
+''' A *discrimination tree* is an index over a set of `Schema` that, given a
+    formula `Fm`, quickly finds the schemas that might have that formula
+    as an instance, without having to try to match each schema in turn.
+
+    Each schema is entered into a trie keyed by its *skeleton:* the
+    sequence of connectives in its formula in prefix (Polish) order, with
+    every metavariable replaced by a wildcard. E.g., ``φ → (ψ → φ)``
+    becomes ``→ * → * *``. A lookup walks the trie along the query
+    formula, following both the branch for the formula's connective at
+    each point and the wildcard branch, which skips the whole subformula
+    at that point.
+
+    The cost of a lookup depends on the size of the query and the shapes
+    of the indexed schemas that are compatible with it, not on the total
+    number of schemas indexed, so it stays fast for libraries of hundreds
+    of thousands of lemmas.
+
+    The index ignores repeated metavariables (``φ → φ`` has the same
+    skeleton as ``φ → ψ``), so the candidates it returns are a superset of
+    the schemas that actually match; use `SchemaIndex.matches()` to get
+    only those that do.
+'''
+
+from    formula  import *
+from    schema  import Schema
+from    typing  import Iterable, List, Optional
+
+class _Node:
+    ''' A trie node. `kids` are the branches for connectives, `star` the
+        branch for a metavariable, and `items` the `(seq, Schema)` pairs
+        whose skeleton ends here. @private
+    '''
+    __slots__ = ('kids', 'star', 'items')
+    def __init__(self):
+        self.kids:dict[str, _Node] = {}
+        self.star:Optional[_Node] = None
+        self.items:list[tuple[int, Schema]] = []
+
+class SchemaIndex:
+    ''' A discrimination tree index of `Schema`; see the module
+        documentation for details.
+
+        >>> from proof import AXIOMS
+        >>> ix = SchemaIndex(AXIOMS['PS'])
+        >>> f = Im(Im(No(A), No(B)), Im(B, A))
+        >>> [ str(s) for s in ix.candidates(f) ]
+        ['φ → (ψ → φ)', '(¬ψ → ¬φ) → (φ → ψ)']
+        >>> [ str(s) for s, _ in ix.matches(f) ]
+        ['(¬ψ → ¬φ) → (φ → ψ)']
+    '''
+
+    def __init__(self, schemas:Iterable[Schema] = ()):
+        self._root = _Node()
+        self._count = 0
+        for s in schemas:  self.add(s)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, schema:Schema) -> None:
+        ' Add `schema` to the index. '
+        node = self._root
+        stack:List[Optional[Fm]] = [schema.fm]
+        while stack:
+            f = stack.pop()
+            if f is None:  continue
+            if f._type is Fm.VAR:
+                if node.star is None:  node.star = _Node()
+                node = node.star
+            else:
+                node = node.kids.setdefault(f._value, _Node())
+                stack.append(f._right); stack.append(f._left)
+        node.items.append((self._count, schema))
+        self._count += 1
+
+    def candidates(self, fm:Fm) -> List[Schema]:
+        ''' Return the schemas whose skeleton is compatible with `fm`, in
+            the order they were added. This includes all schemas of which
+            `fm` is an instance, but may include others as well.
+        '''
+        found:list[tuple[int, Schema]] = []
+        #   Each item of work is a trie node and the query subformulae
+        #   remaining to be matched from there, as a linked list of
+        #   (formula, rest) pairs so that branches can share their tails.
+        work:list[tuple[_Node, Optional[tuple]]] = [(self._root, (fm, None))]
+        while work:
+            node, pending = work.pop()
+            if pending is None:
+                found.extend(node.items); continue
+            f, rest = pending
+            if node.star is not None:
+                work.append((node.star, rest))
+            if f._type is not Fm.VAR:
+                kid = node.kids.get(f._value)
+                if kid is not None:
+                    if f._left is not None:
+                        rest = (f._left, (f._right, rest))
+                    else:
+                        rest = (f._right, rest)
+                    work.append((kid, rest))
+        found.sort(key=lambda i: i[0])
+        return [ s for _, s in found ]
+
+    def matches(self, fm:Fm) -> List[tuple[Schema, tuple[Fm, ...]]]:
+        ''' Return the schemas of which `fm` is an instance, each paired
+            with its substitutions (see `Schema.match()`), in the order the
+            schemas were added.
+        '''
+        found = []
+        for s in self.candidates(fm):
+            subs = s.match(fm)
+            if subs is not None:  found.append((s, subs))
+        return found
@@ -0,0 +1,304 @@
+''' `FmStore` is an alternative to building formulae as `Fm` objects: a
+    store that holds many formulae as a set of parallel arrays, one entry
+    per node, with each formula referenced by the integer id of its root
+    node. A `StoredFm` is a lightweight view of a formula in a store that
+    provides the same read-only API as `Fm`.
+
+    Each node is stored as an opcode (an index into the store's table of
+    the variable names and connectives it has seen) in an ``array('B')``
+    and the ids of its left and right children in two ``array('I')``; id 0
+    is reserved for "no child." Nodes are deduplicated, as `Fm` nodes are
+    interned, so each distinct subformula is stored only once and two
+    formulae in the same store are equal if and only if their ids are.
+    Since each node added has children that were already in the store,
+    every node's id is greater than its children's.
+
+    Deduplication uses an open-addressing hash table, itself an
+    ``array('I')``, rather than a `dict`. All told, each node uses about
+    20 bytes, against about 400 for an `Fm` node and its intern table
+    entry (see ``tool/bench_mem.py``), and the store consists of a handful
+    of objects rather than several per node, so it adds nothing to the
+    work done by the cyclic garbage collector.
+
+    Nodes are never removed from a store; to free them, drop the store.
+
+    >>> st = FmStore()
+    >>> f = st.add(Im(φ, Im(ψ, φ)))
+    >>> str(f), f.vars, len(st)
+    ('φ → (ψ → φ)', 'φψ', 4)
+    >>> st.add(Im(φ, Im(ψ, φ))) == f
+    True
+    >>> g = f.sub({ 'φ': st.add(No(A)), 'ψ': st.add(B) })
+    >>> str(g), g.fm == Im(No(A), Im(B, No(A)))
+    ('¬A → (B → ¬A)', True)
+'''
+
+from    formula  import *
+from    array  import array
+from    typing  import Mapping, Optional, Union
+
+class FmStore:
+    ''' A deduplicated store of formulae as parallel arrays; see the
+        module documentation for details.
+    '''
+
+    def __init__(self):
+        self._syms:list[str] = ['']         # opcode → value
+        self._symop:dict[str, int] = {}     # value → opcode
+        self._symty:list[Optional[Fm.NodeType]] = [None]
+        #   Node 0 is "no node."
+        self._op    = array('B', [0])
+        self._left  = array('I', [0])
+        self._right = array('I', [0])
+        #   Open-addressing hash table of node ids; 0 is an empty slot.
+        self._table = array('I', bytes(4 * 64))
+        self._mask = 63
+
+    def __len__(self) -> int:
+        ' The number of nodes in the store. '
+        return len(self._op) - 1
+
+    @property
+    def nbytes(self) -> int:
+        ' The number of bytes used by the node arrays and hash table. '
+        return sum( a.itemsize * len(a) for a in
+                    (self._op, self._left, self._right, self._table) )
+
+    ################################################################
+    #   Adding nodes
+
+    def _opcode(self, value:str) -> int:
+        op = self._symop.get(value)
+        if op is None:
+            ty = Fm.valtype(value)
+            op = len(self._syms)
+            if op > 255:  raise ValueError('too many distinct symbols')
+            self._syms.append(value); self._symty.append(ty)
+            self._symop[value] = op
+        return op
+
+    def _mk(self, op:int, l:int, r:int) -> int:
+        ''' Return the id of the node with opcode `op` and children `l` and
+            `r`, adding it if it's not already in the store. No validation
+            is done. @private
+        '''
+        table = self._table; mask = self._mask
+        ops = self._op; lefts = self._left; rights = self._right
+        i = hash((op, l, r)) & mask
+        while True:
+            n = table[i]
+            if n == 0:  break
+            if ops[n] == op and lefts[n] == l and rights[n] == r:  return n
+            i = (i + 1) & mask
+        n = len(ops)
+        ops.append(op); lefts.append(l); rights.append(r)
+        table[i] = n
+        if 3 * n > 2 * mask:  self._grow()
+        return n
+
+    def _grow(self) -> None:
+        ' Double the size of the hash table and re-insert all nodes. '
+        size = 2 * (self._mask + 1)
+        table = array('I', bytes(4 * size)); mask = size - 1
+        ops = self._op; lefts = self._left; rights = self._right
+        for n in range(1, len(ops)):
+            i = hash((ops[n], lefts[n], rights[n])) & mask
+            while table[i]:  i = (i + 1) & mask
+            table[i] = n
+        self._table = table; self._mask = mask
+
+    def mk(self, value:str, left:Optional["StoredFm"]=None,
+           right:Optional["StoredFm"]=None) -> "StoredFm":
+        ''' Return the formula with root `value` and subformulae `left` and
+            `right` (from this store), adding it to the store if necessary.
+            This validates the node as `Fm()` does.
+        '''
+        for x in (left, right):
+            if x is not None and x._store is not self:
+                raise ValueError('subformula is from another store')
+        ty = Fm.valtype(value)
+        if ty is Fm.VAR and (left or right):
+            raise ValueError(f'Variable {value!r} may not have children')
+        if ty is Fm.MONADIC and (left or not right):
+            raise ValueError(f'Monadic {value!r} must have only right child')
+        if ty is Fm.DYADIC and (not left or not right):
+            raise ValueError(f'Dyadic {value!r} must have two children')
+        l = 0 if left  is None else left._id
+        r = 0 if right is None else right._id
+        return StoredFm(self, self._mk(self._opcode(value), l, r))
+
+    def add(self, fm:Fm) -> "StoredFm":
+        ' Add formula `fm` to the store, returning the stored formula. '
+        ids = { id(None): 0 }
+        stack = [fm]
+        while stack:
+            f = stack[-1]
+            if id(f) in ids:  stack.pop(); continue
+            li = ids.get(id(f._left)); ri = ids.get(id(f._right))
+            if li is None or ri is None:
+                if ri is None:  stack.append(f._right)     # type: ignore [arg-type]
+                if li is None:  stack.append(f._left)      # type: ignore [arg-type]
+                continue
+            stack.pop()
+            ids[id(f)] = self._mk(self._opcode(f._value), li, ri)
+        return StoredFm(self, ids[id(fm)])
+
+    ################################################################
+    #   Operations on stored formulae, by id
+
+    def _fm(self, n:int) -> Fm:
+        ' Build the `Fm` for the node `n`. '
+        ops = self._op; lefts = self._left; rights = self._right
+        syms = self._syms; tys = self._symty
+        built:dict[int, Optional[Fm]] = { 0: None }
+        stack = [n]
+        while stack:
+            k = stack[-1]
+            if k in built:  stack.pop(); continue
+            l = lefts[k]; r = rights[k]
+            if l not in built or r not in built:
+                if r not in built:  stack.append(r)
+                if l not in built:  stack.append(l)
+                continue
+            stack.pop()
+            built[k] = Fm._mk(syms[ops[k]], tys[ops[k]], built[l], built[r])  # type: ignore [arg-type]
+        return built[n]                     # type: ignore [return-value]
+
+    def _vars(self, n:int) -> str:
+        ''' The variables in node `n` in order of first appearance, left to
+            right. Shared subformulae are visited only once.
+        '''
+        ops = self._op; lefts = self._left; rights = self._right
+        syms = self._syms
+        seen = set(); vs:dict[str, None] = {}
+        stack = [n]
+        while stack:
+            k = stack.pop()
+            if k == 0 or k in seen:  continue
+            seen.add(k)
+            l = lefts[k]; r = rights[k]
+            if l == 0 and r == 0:  vs[syms[ops[k]]] = None
+            else:  stack.append(r); stack.append(l)
+        return ''.join(vs)
+
+    def _str(self, n:int) -> str:
+        ' Print node `n` as `Fm.__str__()` does. '
+        ops = self._op; lefts = self._left; rights = self._right
+        syms = self._syms
+        out:list[str] = []
+        stack:list[Union[int, str]] = [n]
+        def push(k):
+            if lefts[k]:  stack.append(')'); stack.append(k); stack.append('(')
+            else:         stack.append(k)
+        while stack:
+            k = stack.pop()
+            if isinstance(k, str):
+                out.append(k)
+            elif lefts[k]:
+                push(rights[k])
+                stack.append(' ' + syms[ops[k]] + ' ')
+                push(lefts[k])
+            else:
+                out.append(syms[ops[k]])
+                if rights[k]:  push(rights[k])
+        return ''.join(out)
+
+    def _sub(self, n:int, subs:Mapping[str, int]) -> int:
+        ''' Substitute the nodes `subs[v]` for each variable ``v`` in node
+            `n`, returning the id of the result.
+        '''
+        ops = self._op; lefts = self._left; rights = self._right
+        syms = self._syms
+        done = { 0: 0 }
+        stack = [n]
+        while stack:
+            k = stack[-1]
+            if k in done:  stack.pop(); continue
+            l = lefts[k]; r = rights[k]
+            if l == 0 and r == 0:
+                stack.pop()
+                done[k] = subs.get(syms[ops[k]], k)
+                continue
+            if l not in done or r not in done:
+                if r not in done:  stack.append(r)
+                if l not in done:  stack.append(l)
+                continue
+            stack.pop()
+            done[k] = self._mk(ops[k], done[l], done[r])
+        return done[n]
+
+class StoredFm:
+    ''' A formula in an `FmStore`: a view consisting of just the store and
+        the id of the formula's root node in the store. This offers the
+        same read-only interface as `Fm` (except that there is no
+        `__repr__` that can re-create it), computed from the store's
+        arrays; `fm` gives the equivalent `Fm`.
+    '''
+    __slots__ = ('_store', '_id')
+
+    def __init__(self, store:FmStore, id:int):
+        self._store = store
+        self._id = id
+
+    @property
+    def store(self) -> FmStore:  return self._store
+
+    @property
+    def id(self) -> int:
+        ' The id of this formula in its store. '
+        return self._id
+
+    def _kid(self, k:int) -> Optional["StoredFm"]:
+        return StoredFm(self._store, k) if k else None
+
+    @property
+    def value(self) -> str:
+        return self._store._syms[self._store._op[self._id]]
+
+    @property
+    def type(self) -> Fm.NodeType:
+        return self._store._symty[self._store._op[self._id]]  # type: ignore [return-value]
+
+    @property
+    def left(self) -> Optional["StoredFm"]:
+        return self._kid(self._store._left[self._id])
+
+    @property
+    def right(self) -> Optional["StoredFm"]:
+        return self._kid(self._store._right[self._id])
+
+    @property
+    def vars(self) -> str:
+        ' As `Fm.vars`; this is not cached. '
+        return self._store._vars(self._id)
+
+    @property
+    def fm(self) -> Fm:
+        ' The equivalent `Fm`. '
+        return self._store._fm(self._id)
+
+    def sub(self, subs:Mapping[str, "StoredFm"]) -> "StoredFm":
+        ''' Return this formula with each variable ``v`` that is a key in
+            `subs` replaced by the formula ``subs[v]``, as `Schema.sub()`
+            does with its metavariables. All formulae must be in the same
+            store; the result is added to it.
+        '''
+        st = self._store
+        for f in subs.values():
+            if f._store is not st:
+                raise ValueError('substitution is from another store')
+        return StoredFm(st, st._sub(self._id,
+            { v: f._id for v, f in subs.items() }))
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, StoredFm):  return NotImplemented
+        return self._store is other._store and self._id == other._id
+
+    def __hash__(self) -> int:
+        return hash((id(self._store), self._id))
+
+    def __str__(self) -> str:
+        return self._store._str(self._id)
+
+    def __repr__(self) -> str:
+        return f'<StoredFm {self._id}: {self}>'
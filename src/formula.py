@@ -17,19 +17,26 @@
     expressing the `abstract syntax tree`_ (AST), of the formula, with
     connectives at the internal nodes and variables at the leaf nodes.
 
-    Many of the functions operating on this AST are recursive, and thus the
-    total size of the formula they can process (technically, its depth)
-    is limited by the size of the Python stack. This shouldn't be an issue
-    for anything readable by humans, but if we need to handle truly huge
-    formulae, we need to look at using iteration with heap data structures
-    to track our position in the formula.
+    `Fm` nodes are *hash-consed* (interned): constructing a node with the
+    same value and the same (already interned) children as an existing
+    node returns that existing node rather than a new one. Thus two
+    structurally equal formulae are always the same object, equality is an
+    identity check, and repeated subformulae (which are extremely common in
+    proofs) are stored only once. The table of interned nodes holds only
+    weak references, so nodes no longer referenced elsewhere are freed as
+    usual.
+
+    The functions operating on this AST are iterative, using explicit
+    stacks on the heap to track their position in the formula, rather
+    than recursive, so the depth of formulae they can handle is not
+    limited by the Python stack. (Proof generators can produce extremely
+    deep formulae, such as long right-nested chains of implications.)
 
     Future work:
     * XXX Resolve the tension between a 'formula' and a 'schema.' Possibly
       a formula should never be a schema, but a schema should be a separate
       class that you cons with a formula, so that we always know what
       we're using where.
-    * A parser to generate a `Formula` from e.g. ``φ → (ψ → φ)``.
     * Consider how to indicate whether a `Formula` is a schema or not or,
       more likely create a separate schema class, including possibly a
       translation system between metavariable names and indices
@@ -38,12 +45,18 @@
       (PySAT may help if the formulae get complex.) But, per Nishant,
       the check is NP-complete, so not cheap.
 
+    To generate a formula from text such as ``φ → (ψ → φ)``, see the
+    `parse` module.
+
     .. _abstract syntax tree: https://en.wikipedia.org/wiki/Abstract_syntax_tree
 '''
 
+from    array  import array
 from    enum  import Enum
 from    lazyprop  import *
-from    typing  import Optional, Union
+from    threading  import RLock
+from    typing  import Iterable, Optional, Sequence, Union
+from    weakref  import KeyedRef
 
 def No(fm):
     ''' Convenience constructor for negating a formula. This accepts
@@ -82,7 +95,7 @@ class Fm:
         >>> str(Fm('→', Fm('→', No(ψ), No(φ)), Fm('→', φ, ψ)))
         '(¬ψ → ¬φ) → (φ → ψ)'
 
-        See `__init__()` for construction details.
+        See `__new__()` for construction details.
     '''
 
     #   We use an Enum here mainly because it gives nice repr in error output.
@@ -94,7 +107,36 @@ class Fm:
 
     class InternalError(RuntimeError): '@private'
 
-    def __init__(self, vc:Union["Fm", str], left=None, right=None):
+    #   Using slots rather than a per-instance `__dict__` more than halves
+    #   the memory used by each node. The last is the cache for the
+    #   `lazyproperty` `vars` below.
+    __slots__ = ('_value', '_type', '_left', '_right', '_hash', '__weakref__',
+                 '__vars')
+
+    _value:str
+    _type:"Fm.NodeType"
+    _left:Optional["Fm"]
+    _right:Optional["Fm"]
+    _hash:int
+
+    _interned:dict[tuple, KeyedRef] = {}
+    ''' The unique table of weak references to all live `Fm` nodes, keyed
+        by ``(value, id(left), id(right))``. Using the `id()` of the
+        children is safe because a node holds references to its children,
+        keeping them (and thus their ids) alive for as long as the node's
+        entry exists. An entry is removed when its node is freed.
+
+        This is used rather than a `weakref.WeakValueDictionary` because
+        it's about twice as fast to add and remove entries. @private
+    '''
+    _internlock = RLock()
+    ''' Held when replacing or removing a dead entry. This is reentrant
+        because freeing a node (and so calling `_unintern()`) can happen
+        at almost any point, including while this thread holds it.
+        @private
+    '''
+
+    def __new__(cls, vc:Union["Fm", str], left=None, right=None):
         ''' Propositional formula constructor. This takes a propositional
             value or connective `vc` and, optionally, left and right
             sub-nodes for the AST.
@@ -105,34 +147,93 @@ class Fm:
             `left` and `right` may be values of this class or plain
             variable names.
 
-            Formulae ought to be immutable, but Python doesn't have very
-            good facilities for doing this. We do our best by making sure
-            that that the `value`, `type`, `left`, and `right` attributes
-            are read-only. This doesn't prevent anybody from poking at our
+            If a node with the same value and children already exists, that
+            node is returned instead of a new one. (This is why this is
+            `__new__()` rather than `__init__()`.) For this to be correct
+            formulae must be immutable, but Python doesn't have very good
+            facilities for doing this. We do our best by making sure that
+            that the `value`, `type`, `left`, and `right` attributes are
+            read-only. This doesn't prevent anybody from poking at our
             internal variables, but those do start with an underscore as a
             hint that developers should not do this.
         '''
-        self._left:Optional["Fm"]   = self._nodify(left)
-        self._right:Optional["Fm"]  = self._nodify(right)
-        self._value:str             = getattr(vc, 'value', vc) # type: ignore [arg-type]
-        self._type:"Fm.NodeType"    = self.valtype(vc)
-
-        ty = self._type; left = self._left; right = self._right
-        if ty == self.VAR:
+        left = cls._nodify(left); right = cls._nodify(right)
+        value:str = getattr(vc, 'value', vc)    # type: ignore [arg-type]
+        ty = cls.valtype(vc)
+        key = (value, id(left), id(right))
+        ref = cls._interned.get(key)
+        if ref is not None:
+            fm = ref()
+            if fm is not None:  return fm
+
+        if ty == cls.VAR:
             if left is not None or right is not None:
                 raise ValueError(f'AST node {repr(vc)} may not have children')
-        elif ty == self.MONADIC:
+        elif ty == cls.MONADIC:
             if left is not None or right is None:
                 raise ValueError(
                     f'AST monadic node {repr(vc)} must have only right child'
                         ' (left={left}, right={right}')
-        elif ty == self.DYADIC:
+        elif ty == cls.DYADIC:
             if left is None or right is None:
                 raise ValueError(
                     f'AST dyadic node {repr(vc)} must have two children'
                         f' (left={left}, right={right}')
         else:
-            raise self.InternalError()
+            raise cls.InternalError()
+
+        return cls._add(key, value, ty, left, right)
+
+    @classmethod
+    def _mk(cls, value:str, ty:"Fm.NodeType",
+            left:Optional["Fm"], right:Optional["Fm"]) -> "Fm":
+        ''' Return the interned node for the given value, type and children,
+            *without* doing any validation. This is for use only where the
+            arguments are known to make a valid node, such as when copying
+            the structure of an existing formula. @private
+        '''
+        key = (value, id(left), id(right))
+        ref = cls._interned.get(key)
+        if ref is not None:
+            fm = ref()
+            if fm is not None:  return fm
+        return cls._add(key, value, ty, left, right)
+
+    @classmethod
+    def _add(cls, key, value, ty, left, right) -> "Fm":
+        ''' Create and intern a new node, unless another thread has
+            interned one for `key` since we checked. @private
+        '''
+        fm = object.__new__(cls)
+        fm._left  = left
+        fm._right = right
+        fm._value = value
+        fm._type  = ty
+        fm._hash  = hash((value,
+            None if left  is None else left._hash,
+            None if right is None else right._hash))
+        ref = KeyedRef(fm, _unintern, key)
+        old = cls._interned.setdefault(key, ref)    # atomic
+        if old is ref:  return fm
+        #   Either another thread beat us to it or there's a dead entry
+        #   whose callback has not yet removed it.
+        with cls._internlock:
+            cur = cls._interned.get(key)
+            other = None if cur is None else cur()
+            if other is not None:  return other
+            cls._interned[key] = ref
+            return fm
+
+    def __reduce__(self):
+        ''' Pickle (and `copy`) by re-construction so that the unpickled
+            formula is interned in the unpickling process.
+
+            The formula is pickled as the flat encoding from `flatten()`
+            rather than as a graph of `Fm` objects, which makes the pickle
+            far smaller and faster to load and avoids `pickle` recursing
+            once for each level of the formula.
+        '''
+        return (_unpickle, flatten((self,)))
 
     @staticmethod
     def _nodify(x) -> Optional["Fm"]:
@@ -170,12 +271,20 @@ class Fm:
         ''' Return a list (as a `str`) of the unique variables in the formula,
             in the order encountered left to right in the expression.
         '''
-        def _vars(fm:Fm, acc:str) -> str:
-            if fm is None:  return acc
-            acc = _vars(fm.left, acc)
-            if (fm._type is fm.VAR) and (fm.value not in acc):  acc += fm.value
-            return _vars(fm.right, acc)
-        return _vars(self, '')
+        vs:dict[str, None] = {}     # dicts are ordered; sets are not
+        seen = set()                # ids of subformulae already traversed
+        stack:list[Optional[Fm]] = [self]
+        while stack:
+            fm = stack.pop()
+            if fm is None or id(fm) in seen:  continue
+            #   Subformulae are often shared and all the variables of one
+            #   we've already seen have already been added to `vs`.
+            seen.add(id(fm))
+            if fm._type is Fm.VAR:
+                vs[fm._value] = None
+            else:
+                stack.append(fm._right); stack.append(fm._left)
+        return ''.join(vs)
 
     #   XXX The following has various typing issues because of the
     #   conflict between the duck typing it started with and the
@@ -215,14 +324,27 @@ class Fm:
         ''' Return `True` if two formulae are the same, *including variable
             names.* Note that two formulae instantiated from the same schema
             with different substitutions are different formula. @public
+
+            Because formulae are interned, this is just an identity check,
+            which is cheaper even than comparing structural hashes.
         '''
-        if not isinstance(other, self.__class__):
+        if not isinstance(other, Fm):
             return NotImplemented
-        return self.value  == other.value \
-            and self.left  == other.left \
-            and self.right == other.right
+        return self is other
+
+    def __hash__(self) -> int:
+        ''' A structural hash of the formula. This is computed once, when
+            the node is constructed, from the value of the node and the
+            (already computed) hashes of its children, so it's constant
+            time regardless of the size of the formula. @public
+        '''
+        return self._hash
 
-    @lazymethod
+    #   The strings of a formula and of each of its subformulae together
+    #   take space quadratic in the depth of the formula, so rather than
+    #   keeping the string of each node for which it was ever requested,
+    #   we cache only a limited amount of recently used strings.
+    @lrumethod(16 << 20)
     def __repr__(self) -> str:
         ''' A somewhat noisy `repr` that puts `Fm()` constructors everywhere.
             It might be reasonable to remove the `Fm()` around variable
@@ -230,45 +352,147 @@ class Fm:
             directly as strings, and perhaps even print convenience
             constructors (`No`, `Im`) here.
         '''
-        left = self.left; right = self.right
-        s = 'Fm(' + repr(self.value)
-        if not left and not right:
-            retval = s + ')'        # no optional args
-        if left:
-            s += ', ' + repr(left)
-        if right:
-            s += ', '
-            if not left:  s += 'right='
-            s += repr(right)
-        retval = s + ')'
-        return retval
-
-    @lazymethod
+        #   The stack holds both the nodes yet to be printed and the text
+        #   that follows them, in reverse order.
+        out:list[str] = []
+        stack:list[Union[Fm, str]] = [self]
+        while stack:
+            fm = stack.pop()
+            if isinstance(fm, str):
+                out.append(fm); continue
+            out.append('Fm(' + repr(fm._value))
+            if fm._type is Fm.VAR:
+                out.append(')')
+            elif fm._type is Fm.MONADIC:
+                out.append(', right=')
+                stack.append(')'); stack.append(fm._right) # type: ignore [arg-type]
+            else:
+                out.append(', ')
+                stack.append(')'); stack.append(fm._right) # type: ignore [arg-type]
+                stack.append(', '); stack.append(fm._left)  # type: ignore [arg-type]
+        return ''.join(out)
+
+    @lrumethod(16 << 20)
     def __str__(self) -> str:
         ''' Pretty-print the AST an expression with appropriate parentheses
             and spacing.
         '''
-        if self.type == Fm.VAR:
-            retval = self.value
-        elif self.type == Fm.MONADIC:
-            if self.right.type == Fm.DYADIC:
-                retval = self.value + '(' + str(self.right) + ')'
-            else:
-                retval = self.value + str(self.right)
-        elif self.type == Fm.DYADIC:
-            if self.left.type == Fm.DYADIC:
-                s = '(' + str(self.left) + ')'
+        #   As with `__repr__`, the stack holds nodes and text.
+        out:list[str] = []
+        stack:list[Union[Fm, str]] = [self]
+        def push(fm):
+            if fm._type is Fm.DYADIC:
+                stack.append(')'); stack.append(fm); stack.append('(')
             else:
-                s = str(self.left)
-            s += ' ' + self.value + ' '
-            if self.right.type == Fm.DYADIC:
-                s += '(' + str(self.right) + ')'
+                stack.append(fm)
+        while stack:
+            fm = stack.pop()
+            if isinstance(fm, str):
+                out.append(fm)
+            elif fm._type is Fm.VAR:
+                out.append(fm._value)
+            elif fm._type is Fm.MONADIC:
+                out.append(fm._value)
+                push(fm._right)
+            elif fm._type is Fm.DYADIC:
+                push(fm._right)
+                stack.append(' ' + fm._value + ' ')
+                push(fm._left)
             else:
-                s += str(self.right)
-            retval = s
-        else:
-            raise self.InternalError()
-        return retval
+                raise self.InternalError()
+        return ''.join(out)
+
+    def pn(self) -> str:
+        ''' Return the formula in Polish (prefix) notation, as read by
+            `parse.parsepn()`. This has no spaces or parentheses, so it's
+            a compact form for storage and transmission.
+
+            >>> Im(Im(No(ψ), No(φ)), Im(φ, ψ)).pn()
+            '→→¬ψ¬φ→φψ'
+
+            This is not cached, as it's usually generated only once for
+            a given formula.
+        '''
+        out:list[str] = []
+        stack:list[Optional[Fm]] = [self]
+        while stack:
+            fm = stack.pop()
+            if fm is None:  continue
+            out.append(fm._value)
+            stack.append(fm._right); stack.append(fm._left)
+        return ''.join(out)
+
+####################################################################
+#   Flat encoding
+
+def flatten(fms:Iterable[Fm]) -> tuple[str, array, array]:
+    ''' Return a flat encoding of the formulae `fms`: a string of the
+        values of each distinct node in post-order, an array of two indices
+        for each node giving its left and right children, and an array of
+        the index of each formula. An index is the position of the node in
+        the string plus one, or 0 for a missing child. Subformulae shared
+        within and between the formulae are encoded only once.
+
+        >>> flatten([Im(No(A), No(A)), No(A)])
+        ('A¬→', array('B', [0, 0, 0, 1, 2, 2]), array('B', [3, 2]))
+
+        This is a compact form for pickling or storing formulae; see
+        `unflatten()` to decode it.
+    '''
+    index = { id(None): 0 }
+    values:list[str] = []
+    links:list[int] = []
+    roots:list[int] = []
+    for root in fms:
+        stack = [root]
+        while stack:
+            fm = stack[-1]
+            if id(fm) in index:  stack.pop(); continue
+            l = fm._left; r = fm._right
+            li = index.get(id(l)); ri = index.get(id(r))
+            if li is None or ri is None:
+                if ri is None:  stack.append(r)    # type: ignore [arg-type]
+                if li is None:  stack.append(l)    # type: ignore [arg-type]
+                continue
+            stack.pop()
+            values.append(fm._value)
+            links.append(li); links.append(ri)
+            index[id(fm)] = len(values)
+        roots.append(index[id(root)])
+    return ''.join(values), _packed(links), _packed(roots)
+
+def _packed(xs:list[int]) -> array:
+    ' An `array` of `xs` using the smallest item size that will hold them. '
+    top = max(xs, default=0)
+    return array('B' if top < 1<<8 else 'H' if top < 1<<16 else 'L', xs)
+
+def unflatten(values:str, links:Sequence[int],
+              roots:Sequence[int]) -> list[Fm]:
+    ''' Decode the encoding produced by `flatten()`, returning the list of
+        formulae `Fm`.
+    '''
+    nodes:list[Optional[Fm]] = [None]
+    mk = Fm._mk
+    for i, value in enumerate(values):
+        l = nodes[links[2*i]]; r = nodes[links[2*i + 1]]
+        ty = Fm.DYADIC if l is not None \
+            else Fm.VAR if r is None else Fm.MONADIC
+        nodes.append(mk(value, ty, l, r))
+    return [ nodes[i] for i in roots ]     # type: ignore [misc]
+
+def _unpickle(values:str, links:Sequence[int], roots:Sequence[int]) -> Fm:
+    ' Unpickle a single `Fm`; see `Fm.__reduce__()`. @private '
+    return unflatten(values, links, roots)[0]
+
+####################################################################
+
+def _unintern(ref:KeyedRef) -> None:
+    ''' Remove the entry for a freed `Fm` from `Fm._interned`, if it is
+        still this dead reference and has not been replaced by one to a
+        new node with the same key.
+    '''
+    with Fm._internlock:
+        if Fm._interned.get(ref.key) is ref:  del Fm._interned[ref.key]
 
 ####################################################################
 #   Variables, for convenience.
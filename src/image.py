@@ -0,0 +1,367 @@
+''' A compact binary format for a corpus of proofs, an *image*, that is
+    read by memory-mapping the file, so opening even a very large image
+    takes only as long as reading its header. Formulae and steps are
+    decoded from the mapped file only when they are asked for, and
+    processes mapping the same file share the pages of it that they read.
+
+    `save()` writes an image of a sequence of `Proof`s and `Image` opens
+    one. An image holds:
+
+    - A header (see `HEADER`) giving the counts and positions of the rest.
+    - The symbol table: the variable names and connectives used.
+    - The node table: every distinct (sub)formula in all the proofs, as
+      with `formula.flatten()`, stored only once however many proofs
+      share it. Each node is a varint (see `varint()`) of its symbol
+      number and shape (variable, monadic or dyadic) followed by varints
+      of the distance back to each child, which is always earlier.
+    - For each proof, its axiom schema and givens (as node numbers) and a
+      table of steps, one record for each `Given`, `Axiom` or `MP` step.
+    - Sparse indices of the nodes and of each proof's steps, giving the
+      position of every `STRIDE`-th record, so that a node or step can be
+      found by skipping at most `STRIDE` - 1 records.
+
+    All fixed-size integers are little-endian.
+
+    >>> import tempfile, os; path = os.path.join(tempfile.mkdtemp(), 'i')
+    >>> from proof import AXIOMS, Given, MP
+    >>> pr = Proof(AXIOMS['PS'], [P, Im(P, Q)],
+    ...     [(1, Given(1)), (2, Given(2)), (3, MP(1, 2))])
+    >>> save(path, [pr, pr])
+    >>> with Image(path) as im:
+    ...     len(im), im.step(1, 3), str(im.proof(0).assertion)
+    (2, MP(1,2), 'Q')
+'''
+
+from    formula  import *
+from    proof  import Axiom, Given, MP, Proof, Step
+from    schema  import Schema
+
+from    mmap  import mmap, ACCESS_READ
+from    struct  import Struct
+from    typing  import BinaryIO, Iterable, Optional, Sequence, Union
+import  os
+
+MAGIC = b'HPSI'
+VERSION = 1
+
+HEADER = Struct('<4sHHIIQQQQQ')
+''' The image header: `MAGIC`, `VERSION`, `STRIDE`, the number of nodes,
+    the number of proofs and the offsets of the symbol table, node table,
+    node index, proof index and end of the image.
+'''
+
+STRIDE = 16
+''' Every `STRIDE`-th node and step is indexed. Larger values make images
+    slightly smaller and random access slower.
+'''
+
+_Q = Struct('<Q')
+
+#   Node shapes, in the low two bits of a node's first varint.
+_VAR, _MONADIC, _DYADIC = 0, 1, 2
+#   Step kinds, the first varint of a step.
+_GIVEN, _AXIOM, _MP = 0, 1, 2
+
+def varint(n:int) -> bytes:
+    ''' Encode the non-negative integer `n` as a varint: seven bits per
+        byte, least significant first, with the top bit set on all but
+        the last byte.
+    '''
+    out = bytearray()
+    while n > 0x7F:
+        out.append(n & 0x7F | 0x80)
+        n >>= 7
+    out.append(n)
+    return bytes(out)
+
+def _varint(buf, pos:int) -> tuple[int, int]:
+    ' Decode the varint at `pos` in `buf`, returning it and the next `pos`. '
+    n = 0; shift = 0
+    while True:
+        b = buf[pos]; pos += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:  return n, pos
+        shift += 7
+
+####################################################################
+#   Writing
+
+def save(file:Union[str, os.PathLike, BinaryIO], proofs:Iterable[Proof]) -> None:
+    ''' Write an image of `proofs` to `file`, a path or a binary file
+        open for writing. Proofs with lemmas (see `proof.Lemma`) can't
+        be stored in an image.
+    '''
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, 'wb') as f:  save(f, proofs)
+        return
+    proofs = list(proofs)
+
+    #   Collect every formula, as with `Proof.__reduce__()`.
+    fms:list[Fm] = []
+    def ref(f:Fm) -> int:
+        fms.append(f);  return len(fms) - 1
+    recs = []
+    for pr in proofs:
+        if pr._lemmas:
+            raise ValueError('proofs with lemmas cannot be saved in an image')
+        schema = [ ref(sc.fm) for sc in pr._axiom_schema ]
+        givens = [ ref(g) for g in pr._givens ]
+        steps:list[tuple] = []
+        for s in pr._steps:
+            if isinstance(s, Axiom):
+                subs = s._substitutions
+                steps.append((_AXIOM, s._index,
+                    None if subs is None else [ ref(f) for f in subs ],
+                    None if s._asserted is None else ref(s._asserted)))
+            elif isinstance(s, MP):    steps.append((_MP, s.min, s.maj))
+            elif isinstance(s, Given): steps.append((_GIVEN, s.index))
+            else:                      raise Proof.InternalError()
+        recs.append((schema, givens, steps))
+    values, links, roots = flatten(fms)
+
+    syms = ''.join(dict.fromkeys(values))
+    symtab = bytearray(varint(len(syms)))
+    for c in syms:
+        b = c.encode('UTF-8'); symtab += varint(len(b)) + b
+    symnum = { c: i for i, c in enumerate(syms) }
+
+    nodes = bytearray(); nodeidx = bytearray()
+    for i, v in enumerate(values):
+        n = i + 1; l = links[2*i]; r = links[2*i + 1]
+        if i % STRIDE == 0:  nodeidx += _Q.pack(len(nodes))
+        shape = _DYADIC if l else _MONADIC if r else _VAR
+        nodes += varint(symnum[v] << 2 | shape)
+        if l:  nodes += varint(n - l)
+        if r:  nodes += varint(n - r)
+
+    out = bytearray(HEADER.size)
+    out += symtab
+    nodesoff = len(out);  out += nodes
+    nodeidxoff = len(out);  out += nodeidx
+    proofoffs = []
+    for schema, givens, steps in recs:
+        proofoffs.append(len(out))
+        p = bytearray(varint(len(schema)))
+        for i in schema:  p += varint(roots[i])
+        p += varint(len(givens))
+        for i in givens:  p += varint(roots[i])
+        p += varint(len(steps))
+        stepidx = []
+        for n, st in enumerate(steps, 1):
+            if (n - 1) % STRIDE == 0:  stepidx.append(len(p))
+            p += varint(st[0])
+            if st[0] == _GIVEN:
+                p += varint(st[1])
+            elif st[0] == _MP:
+                p += varint(n - st[1]) + varint(n - st[2])
+            else:
+                _, index, subrefs, asserted = st
+                p += varint(index)
+                if subrefs is None:  p += varint(0)
+                else:
+                    p += varint(len(subrefs) + 1)
+                    for i in subrefs:  p += varint(roots[i])
+                p += varint(0 if asserted is None else roots[asserted])
+        #   The step index follows the steps, with its offset (relative
+        #   to the start of the proof) first.
+        out += _Q.pack(8 + len(p)) + p
+        for off in stepidx:  out += _Q.pack(8 + off)
+    proofidxoff = len(out)
+    for off in proofoffs:  out += _Q.pack(off)
+    HEADER.pack_into(out, 0, MAGIC, VERSION, STRIDE, len(values),
+        len(proofs), HEADER.size, nodesoff, nodeidxoff, proofidxoff, len(out))
+    file.write(out)
+
+####################################################################
+#   Reading
+
+class Image:
+    ''' A memory-mapped image of proofs written by `save()`. Only the
+        header and symbol table are read when it is opened; nodes and
+        steps are decoded when requested, and each decoded formula is
+        cached so that it is decoded only once.
+
+        An `Image` may be used as a context manager that `close()`s it.
+    '''
+
+    class FormatError(ValueError):
+        ' The file is not an image, or is not one this version can read. '
+
+    def __init__(self, path:Union[str, os.PathLike]):
+        with open(path, 'rb') as f:
+            try:
+                self._map:Optional[mmap] = mmap(f.fileno(), 0, access=ACCESS_READ)
+            except ValueError:          # empty file
+                raise self.FormatError('not a proof image') from None
+        buf = self._buf = memoryview(self._map)
+        err = None
+        if len(buf) < HEADER.size:
+            err = 'not a proof image'
+        else:
+            magic, version, self._stride, self._nnodes, self._nproofs, \
+                symoff, self._nodesoff, self._nodeidxoff, self._proofidxoff, \
+                end = HEADER.unpack_from(buf)
+            if magic != MAGIC:
+                err = 'not a proof image'
+            elif version != VERSION:
+                err = f'unsupported image version {version}'
+            elif end != len(buf):
+                err = f'image is {len(buf)} bytes, expected {end}'
+        if err is not None:
+            self.close();  raise self.FormatError(err)
+
+        nsyms, pos = _varint(buf, symoff)
+        self._syms:list[str] = []
+        for _ in range(nsyms):
+            k, pos = _varint(buf, pos)
+            self._syms.append(bytes(buf[pos:pos+k]).decode('UTF-8'))
+            pos += k
+        self._fms:dict[int, Fm] = {}
+
+    def close(self) -> None:
+        ' Unmap the image. Formulae and proofs already read remain usable. '
+        if self._map is not None:
+            self._buf.release(); self._map.close()
+            self._map = None
+
+    def __enter__(self) -> "Image":  return self
+    def __exit__(self, *exc) -> None:  self.close()
+
+    def __len__(self) -> int:
+        ' The number of proofs in the image. '
+        return self._nproofs
+
+    @property
+    def nnodes(self) -> int:
+        ' The number of distinct formula nodes in the image. '
+        return self._nnodes
+
+    def _seek(self, idxoff:int, base:int, k:int, skip) -> int:
+        ''' Return the position of record `k` (0-based) of a table whose
+            sparse index is at `idxoff`, with offsets relative to `base`;
+            `skip(pos)` returns the position of the record after the one
+            at `pos`.
+        '''
+        i, r = divmod(k, self._stride)
+        pos = base + _Q.unpack_from(self._buf, idxoff + 8*i)[0]
+        for _ in range(r):  pos = skip(pos)
+        return pos
+
+    def _skipnode(self, pos:int) -> int:
+        buf = self._buf
+        head, pos = _varint(buf, pos)
+        for _ in range(head & 3):  _, pos = _varint(buf, pos)
+        return pos
+
+    def _node(self, n:int) -> tuple[str, int, int]:
+        ' The value and left and right child numbers (or 0) of node `n`. '
+        if not 0 < n <= self._nnodes:  raise IndexError(f'no node {n}')
+        buf = self._buf
+        pos = self._seek(self._nodeidxoff, self._nodesoff, n - 1, self._skipnode)
+        head, pos = _varint(buf, pos)
+        l = r = 0
+        if head & 3 == _DYADIC:
+            l, pos = _varint(buf, pos);  l = n - l
+        if head & 3:
+            r, pos = _varint(buf, pos);  r = n - r
+        return self._syms[head >> 2], l, r
+
+    def fm(self, n:int) -> Fm:
+        ''' Return the formula of node `n` (numbered from 1), decoding it
+            and any of its subformulae not already decoded.
+        '''
+        fms = self._fms
+        f = fms.get(n)
+        if f is not None:  return f
+        stack = [n]; nodes = {}
+        while stack:
+            k = stack[-1]
+            if k in fms:  stack.pop(); continue
+            if k not in nodes:  nodes[k] = self._node(k)
+            v, l, r = nodes[k]
+            if l and l not in fms:  stack.append(l); continue
+            if r and r not in fms:  stack.append(r); continue
+            stack.pop()
+            ty = Fm.DYADIC if l else Fm.MONADIC if r else Fm.VAR
+            fms[k] = Fm._mk(v, ty, fms.get(l), fms.get(r))  # type: ignore [arg-type]
+        return fms[n]
+
+    def _proofhead(self, i:int) -> tuple[int, list[int], list[int], int, int]:
+        ''' Return the offset, schema nodes, given nodes, step count and
+            position of the first step of proof `i`.
+        '''
+        if not 0 <= i < self._nproofs:  raise IndexError(f'no proof {i}')
+        buf = self._buf
+        base = _Q.unpack_from(buf, self._proofidxoff + 8*i)[0]
+        pos = base + 8
+        lists = []
+        for _ in range(2):
+            k, pos = _varint(buf, pos)
+            xs = []
+            for _ in range(k):  x, pos = _varint(buf, pos); xs.append(x)
+            lists.append(xs)
+        nsteps, pos = _varint(buf, pos)
+        return base, lists[0], lists[1], nsteps, pos
+
+    def _step(self, pos:int, n:int) -> tuple[Step, int]:
+        ' Decode step `n` at `pos`, returning it and the next position. '
+        buf = self._buf
+        kind, pos = _varint(buf, pos)
+        if kind == _GIVEN:
+            index, pos = _varint(buf, pos)
+            return Given(index), pos
+        if kind == _MP:
+            a, pos = _varint(buf, pos); b, pos = _varint(buf, pos)
+            return MP(n - a, n - b), pos
+        if kind != _AXIOM:
+            raise self.FormatError(f'bad step kind {kind}')
+        index, pos = _varint(buf, pos)
+        k, pos = _varint(buf, pos)
+        subs:Optional[list[Fm]] = None
+        if k:
+            subs = []
+            for _ in range(k - 1):
+                x, pos = _varint(buf, pos);  subs.append(self.fm(x))
+        x, pos = _varint(buf, pos)
+        return Axiom(index, subs, self.fm(x) if x else None), pos
+
+    def _skipstep(self, pos:int) -> int:
+        buf = self._buf
+        kind, pos = _varint(buf, pos)
+        if kind == _GIVEN:  return _varint(buf, pos)[1]
+        if kind == _MP:     return _varint(buf, _varint(buf, pos)[1])[1]
+        _, pos = _varint(buf, pos)
+        k, pos = _varint(buf, pos)
+        for _ in range(k - 1):  _, pos = _varint(buf, pos)
+        return _varint(buf, pos)[1]         # the asserted formula, or 0
+
+    def nsteps(self, i:int) -> int:
+        ' The number of steps in proof `i`. '
+        return self._proofhead(i)[3]
+
+    def step(self, i:int, n:int) -> Step:
+        ''' Decode step `n` (numbered from 1) of proof `i` (numbered from 0)
+            without decoding the rest of the proof. The step is not part of
+            any `Proof`.
+        '''
+        base, _, _, nsteps, _ = self._proofhead(i)
+        if not 0 < n <= nsteps:  raise IndexError(f'no step {n}')
+        idxoff = base + _Q.unpack_from(self._buf, base)[0]
+        return self._step(self._seek(idxoff, base, n - 1, self._skipstep), n)[0]
+
+    def proof(self, i:int) -> Proof:
+        ''' Decode proof `i` (numbered from 0). Only the formulae of its
+            schema, givens and `Axiom` steps are decoded; as with any
+            `Proof`, the formulae of the steps are derived as needed.
+        '''
+        _, schema, givens, nsteps, pos = self._proofhead(i)
+        steps = []
+        for n in range(1, nsteps + 1):
+            s, pos = self._step(pos, n)
+            steps.append((n, s))
+        return Proof([ Schema(self.fm(x)) for x in schema ],
+                     [ self.fm(x) for x in givens ], steps)
+
+    def proofs(self) -> Iterable[Proof]:
+        ' Decode each of the proofs in turn. '
+        for i in range(self._nproofs):  yield self.proof(i)
@@ -0,0 +1,167 @@
+''' Opt-in instrumentation of the hot paths of proof checking, to find
+    where the time goes when checking a proof is slow.
+
+    Within an `instrument()` context, these are counted and (except for
+    the cheapest) timed in the `Stats` object it returns:
+
+    - ``Schema.sub``: instantiations of axiom schema;
+    - ``Fm._add``: allocations of new `Fm` nodes (nodes found in the
+      intern table are not allocated);
+    - ``Fm.__eq__``: formula comparisons, each of which visits one node,
+      as formulae are interned (counted only);
+    - ``Proof._fm``: lookups of the formulae of steps, including those
+      of the premises of each `MP` check and those of a `LazyProof`,
+      whose override defers to it (counted only);
+    - ``MP._check``: checks of the validity of `MP` steps, in total and
+      for each `Proof`.
+
+    Times are inclusive: the time of an `MP` check includes that of any
+    schema instantiations done to derive the formulae of its premises.
+
+    The instrumentation works by replacing these methods with wrappers on
+    entering the context and restoring the originals on leaving it, so it
+    costs nothing at all when not in use. Only one context may be active
+    at a time, and counts are not exact if several threads check proofs
+    at once.
+
+    >>> from formula import Im, P, Q
+    >>> from proof import AXIOMS, Given, MP
+    >>> pr = Proof(AXIOMS['PS'], [P, Im(P, Q)],
+    ...     [(1, Given(1)), (2, Given(2)), (3, MP(1, 2))])
+    >>> with instrument() as stats:
+    ...     pr.valid
+    True
+    >>> stats['MP._check'].calls, stats.proof(pr).calls
+    (1, 1)
+'''
+
+from    formula  import Fm
+from    proof  import MP, Proof
+from    schema  import Schema
+
+from    contextlib  import contextmanager
+from    time  import perf_counter
+from    typing  import Iterator, Optional, TextIO
+import  csv, json
+
+class Counter:
+    ' The number of `calls` of something and the total `seconds` they took. '
+    __slots__ = ('calls', 'seconds')
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+
+    def __repr__(self) -> str:
+        return f'Counter(calls={self.calls}, seconds={self.seconds:.6f})'
+
+class Stats:
+    ''' The counts and times collected by `instrument()`. Reading
+        ``stats[name]`` gives the `Counter` for one of the names listed
+        in the module documentation; `proof()` gives the `Counter` of `MP`
+        checks for a particular proof.
+    '''
+
+    NAMES = ('Schema.sub', 'Fm._add', 'Fm.__eq__', 'Proof._fm', 'MP._check')
+
+    def __init__(self):
+        self._counters = { name: Counter() for name in self.NAMES }
+        self._proofs:dict[int, tuple[object, Counter]] = {}
+
+    def __getitem__(self, name:str) -> Counter:
+        return self._counters[name]
+
+    def proof(self, proof:object) -> Counter:
+        ''' The `Counter` of `MP` checks for `proof`. Stats hold a reference
+            to each proof they have counted.
+        '''
+        entry = self._proofs.get(id(proof))
+        if entry is None:
+            entry = self._proofs[id(proof)] = (proof, Counter())
+        return entry[1]
+
+    def rows(self) -> list[dict]:
+        ''' A flat report: a `dict` of ``name``, ``proof``, ``calls`` and
+            ``seconds`` for each of the totals (with ``proof`` `None`) and
+            then the `MP` checks of each proof (with ``proof`` the number
+            of the proof, counting from 1 in the order they were first
+            checked).
+        '''
+        rows = [ { 'name': name, 'proof': None,
+                   'calls': c.calls, 'seconds': c.seconds }
+                 for name, c in self._counters.items() ]
+        for i, (_, c) in enumerate(self._proofs.values(), 1):
+            rows.append({ 'name': 'MP._check', 'proof': i,
+                          'calls': c.calls, 'seconds': c.seconds })
+        return rows
+
+    def write_json(self, f:TextIO) -> None:
+        ' Write `rows()` to `f` as a JSON array of objects. '
+        json.dump(self.rows(), f, indent=1)
+        f.write('\n')
+
+    def write_csv(self, f:TextIO) -> None:
+        ''' Write `rows()` to `f` as CSV with a header line. `f` should be
+            opened with ``newline=''``.
+        '''
+        w = csv.DictWriter(f, ('name', 'proof', 'calls', 'seconds'))
+        w.writeheader()
+        w.writerows(self.rows())
+
+_active:Optional[Stats] = None
+
+@contextmanager
+def instrument() -> Iterator[Stats]:
+    ''' Instrument proof checking for the duration of the context, yielding
+        the `Stats` in which the counts and times are collected.
+    '''
+    global _active
+    if _active is not None:
+        raise RuntimeError('instrumentation is already active')
+    stats = _active = Stats()
+    saved = []
+    def patch(cls, name, wrapper):
+        saved.append((cls, name, cls.__dict__[name]))
+        setattr(cls, name, wrapper)
+
+    def timed(c:Counter, f):
+        def wrapper(*args):
+            c.calls += 1
+            start = perf_counter()
+            try:
+                return f(*args)
+            finally:
+                c.seconds += perf_counter() - start
+        return wrapper
+
+    def counted(c:Counter, f):
+        def wrapper(*args):
+            c.calls += 1
+            return f(*args)
+        return wrapper
+
+    sub = timed(stats['Schema.sub'], Schema.sub)
+    add = timed(stats['Fm._add'], Fm.__dict__['_add'].__func__)
+    eq = counted(stats['Fm.__eq__'], Fm.__eq__)
+    fm = counted(stats['Proof._fm'], Proof._fm)
+    mpc = stats['MP._check']; check = MP._check
+    def mpcheck(self):
+        c = stats.proof(self._proof)
+        mpc.calls += 1; c.calls += 1
+        start = perf_counter()
+        try:
+            return check(self)
+        finally:
+            t = perf_counter() - start
+            mpc.seconds += t; c.seconds += t
+
+    try:
+        patch(Schema, 'sub', sub)
+        patch(Fm, '_add', classmethod(add))
+        patch(Fm, '__eq__', eq)
+        patch(Proof, '_fm', fm)
+        patch(MP, '_check', mpcheck)
+        yield stats
+    finally:
+        for cls, name, orig in reversed(saved):  setattr(cls, name, orig)
+        _active = None
@@ -8,26 +8,132 @@
     that is initialised once on first access. The `lazymethod` decorator
     converts a method to one that is called only once.
 
+    Reading a cached `lazyproperty` is not as fast as reading a
+    `functools.cached_property`: to be read-only and to work with
+    ``__slots__`` it must be a data descriptor, so every read runs its
+    Python ``__get__()`` (about 55 ns against 17 ns; see
+    ``tool/bench_lazyprop.py``). Where neither matters,
+    ``@lazyproperty(writable=True)`` gives a property whose cached value
+    is read as a plain instance attribute, as fast as `cached_property`.
+
     These are useful mainly for objects that are at least partially
     "immutable," i.e., that have data that is set when the object is
     instantiated and not changed thereafter.
+
+    The `lrumethod` decorator is similar to `lazymethod`, but keeps the
+    return values in an `LRUCache` of bounded size, discarding the least
+    recently used values when it is full. This suits values that are
+    large and not often needed, which would otherwise be kept for the
+    life of every object on which the method was ever called. The cache
+    does not keep the objects alive.
+
+    Both (but not ``writable`` properties) work with classes using
+    ``__slots__``, so long as the class
+    declares a slot for the cached value. The slot name is the name of
+    the property or method prefixed with ``__``; Python's usual name
+    mangling of private names in ``__slots__`` is taken into account::
+
+        class C:
+            __slots__ = ('__p', '____str__')
+            @lazyproperty
+            def p(self): ...
+            @lazymethod
+            def __str__(self): ...
 '''
 
-__all__ = ['lazyproperty', 'lazymethod']
+from    collections  import OrderedDict
+from    threading  import Lock
+from    types  import MemberDescriptorType, MethodType
+from    typing  import Any, Callable
+from    weakref  import KeyedRef
+import  sys
+
+__all__ = ['lazyproperty', 'lazymethod', 'lrumethod', 'LRUCache']
+
+def _cacheattr(owner, name:str) -> str:
+    ''' Return the name of the attribute of class `owner` in which to cache
+        the value for the lazy property or method `name`. This is the
+        slot for it if `owner` declares one, otherwise a regular attribute.
+    '''
+    attr = '__' + name                          # should be one _ or two?
+    slot = attr
+    if not attr.endswith('__') and owner.__name__.strip('_'):
+        slot = '_' + owner.__name__.lstrip('_') + attr  # mangled
+    if isinstance(owner.__dict__.get(slot), MemberDescriptorType):
+        return slot
+    return attr
 
-class LazyProperty:
+_MISSING = object()     # no value cached
 
-    def __init__(self, f):
+class _Lazy:
+    ''' The caching common to `LazyProperty` and `LazyMethod`.
+
+        A cached value is read with a single `getattr()` with a default,
+        which is the fastest way to read either a slot or an instance
+        attribute, and doesn't create an exception when there's no value
+        in the ``__dict__``.
+
+        If `lock` is true, the first computation for each instance is done
+        while holding a lock for that instance, so that concurrent first
+        reads compute the value only once. (The per-instance locks are
+        kept only while a value is being computed.) Otherwise concurrent
+        first reads may each compute (and return) a value.
+    '''
+
+    def __init__(self, f, lock:bool=False):
         self.f = f
         self.name = self.f.__name__
-        self.cacheattr = '__' + self.name       # should be one _ or two?
+        self.cacheattr = '__' + self.name
+        self.lock = Lock() if lock else None
+        self.locks:dict[int, list] = {}     # id(obj) → [lock, users]
+
+    def __set_name__(self, owner, name):
+        self.cacheattr = _cacheattr(owner, self.name)
+
+    def _lookup(self, obj):
+        ' The cached value for `obj`, or `_MISSING`. '
+        return getattr(obj, self.cacheattr, _MISSING)
+
+    def _cached(self, obj):
+        ''' Return the cached value for `obj`, or compute and cache it. '''
+        value = getattr(obj, self.cacheattr, _MISSING)
+        if value is _MISSING:  return self._first(obj)
+        return value
+
+    def _first(self, obj):
+        ''' Compute and cache the value for `obj`, first taking the lock for
+            `obj` if we use locks.
+        '''
+        if self.lock is None:
+            value = self.f(obj)
+            setattr(obj, self.cacheattr, value)
+            return value
+        with self.lock:
+            entry = self.locks.setdefault(id(obj), [Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                value = self._lookup(obj)
+                if value is _MISSING:
+                    value = self.f(obj)
+                    setattr(obj, self.cacheattr, value)
+                return value
+        finally:
+            with self.lock:
+                entry[1] -= 1
+                if entry[1] == 0:  del self.locks[id(obj)]
+
+class LazyProperty(_Lazy):
 
     def __get__(self, obj, objtype=None):
-        if hasattr(obj, self.cacheattr):
-            return getattr(obj, self.cacheattr)
-        else:
-            setattr(obj, self.cacheattr, self.f(obj))
-            return getattr(obj, self.cacheattr)
+        #   This is `_cached()` inline, as every function call counts here.
+        value = getattr(obj, self.cacheattr, _MISSING)
+        if value is _MISSING:
+            if obj is None:  return self
+            if self.lock is not None:  return self._first(obj)
+            value = self.f(obj)
+            setattr(obj, self.cacheattr, value)
+        return value
 
     def __set__(self, obj, value):
         #   Message stolen from Python docs:
@@ -35,7 +141,30 @@ class LazyProperty:
         raise AttributeError(f'property {self.name!r}'
             f' of {type(obj).__name__!r} object has no setter')
 
-def lazyproperty(f):
+class WritableLazyProperty(_Lazy):
+    ''' A `LazyProperty` that is a non-data descriptor, like
+        `functools.cached_property`: the value is cached in the instance
+        ``__dict__`` under the property's own name, so that later reads
+        find it there without calling the descriptor at all.
+    '''
+
+    def __set_name__(self, owner, name):
+        if not owner.__dictoffset__:
+            raise TypeError(f'writable lazyproperty {name!r} needs a'
+                f' __dict__ in {owner.__name__!r} instances')
+        self.cacheattr = self.name
+
+    def _lookup(self, obj):
+        return obj.__dict__.get(self.name, _MISSING)
+
+    def __get__(self, obj, objtype=None):
+        #   Called only when there's no cached value.
+        if obj is None:  return self
+        if self.lock is not None:  return self._first(obj)
+        value = obj.__dict__[self.name] = self.f(obj)
+        return value
+
+def lazyproperty(f=None, *, lock:bool=False, writable:bool=False):
     ''' When used to decorate a method taking only `self`, this turns it
         into a read-only property that is lazily initialised and, after the
         first read, returns a cached copy of the generated value. E.g.::
@@ -55,11 +184,26 @@ def lazyproperty(f):
 
         This differs from the `functools.cached_property` decorator in
         that it it creates a read-only property, rather than allowing
-        the property to be set.
+        the property to be set, and it works with ``__slots__``. The price
+        is that a cached read calls the property's ``__get__()``, which
+        makes it several times slower than reading a `cached_property`.
+
+        ``@lazyproperty(writable=True)`` creates a property like
+        `cached_property` instead, which is as fast to read: the value is
+        cached in an instance attribute of the same name as the property,
+        which hides it. So the property can be set (or deleted, to be
+        recomputed on the next read), and the class must not use
+        ``__slots__`` unless they include ``__dict__``.
+
+        Use ``@lazyproperty(lock=True)`` to ensure that the value is
+        computed only once even when several threads read it at the same
+        time; see `_Lazy`. This makes only the first read slower.
     '''
-    return LazyProperty(f)
+    cls = WritableLazyProperty if writable else LazyProperty
+    if f is None:  return lambda f: cls(f, lock)
+    return cls(f, lock)
 
-def lazymethod(f):
+def lazymethod(f=None, *, lock:bool=False):
     ''' When used to decorate a method taking only `self`, this turns it
         into a method that on the first call is run and has its return
         value cached and on subsequent calls just returns the cached value.
@@ -78,15 +222,123 @@ def lazymethod(f):
         data in the object that are considered immutable. Nor may it
         change its return value based on parameters, which is why the
         method may not take any (except `self`).
+
+        As with `lazyproperty`, ``@lazymethod(lock=True)`` computes the
+        value only once even when called from several threads at once.
     '''
-    name = f.__name__
-    cacheattr = '__' + name       # should be one _ or two?
-    def m(obj):
-        if hasattr(obj, cacheattr):
-            return getattr(obj, cacheattr)
-        else:
-            setattr(obj, cacheattr, f(obj))
-            return getattr(obj, cacheattr)
-    return m
+    if f is None:  return lambda f: LazyMethod(f, lock)
+    return LazyMethod(f, lock)
 
+class LazyMethod(_Lazy):
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:  return self
+        return MethodType(self._cached, obj)
+
+    def __call__(self, obj):
+        return self._cached(obj)
+
+class LRUCache:
+    ''' A cache of values keyed by object holding at most `maxbytes` bytes
+        of values, as measured by `sizeof` (by default, `sys.getsizeof()`).
+        When adding a value would exceed this, the least recently used
+        values are discarded. A single value larger than `maxbytes` is not
+        cached at all.
+
+        The cache holds only a weak reference to each key object (which
+        must support them), so caching a value never keeps its key alive;
+        when a key is freed its value is discarded on the next use of the
+        cache. Keys are compared by identity.
+    '''
+
+    def __init__(self, maxbytes:int, sizeof:Callable[[Any], int]=sys.getsizeof):
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof
+        self.nbytes = 0
+        #   Entries of (weak reference to key, value, size) by id(key).
+        self._values:OrderedDict[int, tuple[KeyedRef, object, int]] \
+            = OrderedDict()
+        #   The references to keys that have been freed. Their entries are
+        #   removed under the lock, not by the callback, which may run in
+        #   the middle of an update of `_values`.
+        self._dead:list[KeyedRef] = []
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._purge()
+            return len(self._values)
+
+    def _purge(self) -> None:
+        ' Remove the entries of freed keys. Call with the lock held. '
+        while self._dead:
+            ref = self._dead.pop()
+            entry = self._values.get(ref.key)
+            if entry is not None and entry[0] is ref:
+                del self._values[ref.key]
+                self.nbytes -= entry[2]
+
+    def get(self, key, default=None):
+        ''' Return the value for `key`, marking it as the most recently used,
+            or `default` if it's not in the cache.
+        '''
+        with self._lock:
+            self._purge()
+            entry = self._values.get(id(key))
+            if entry is None or entry[0]() is not key:  return default
+            self._values.move_to_end(id(key))
+            return entry[1]
+
+    def put(self, key, value) -> None:
+        ' Cache `value` for `key`, discarding values as needed to fit it. '
+        size = self.sizeof(value)
+        if size > self.maxbytes:  return
+        ref = KeyedRef(key, self._dead.append, id(key))
+        with self._lock:
+            self._purge()
+            old = self._values.pop(id(key), None)
+            if old is not None:  self.nbytes -= old[2]
+            while self.nbytes + size > self.maxbytes:
+                self.nbytes -= self._values.popitem(last=False)[1][2]
+            self._values[id(key)] = (ref, value, size)
+            self.nbytes += size
+
+    def clear(self) -> None:
+        ' Discard all values. '
+        with self._lock:
+            self._values.clear()
+            self._dead.clear()
+            self.nbytes = 0
+
+def lrumethod(maxbytes:int):
+    ''' As `lazymethod`, but the values returned are cached not in the
+        object but in an `LRUCache` of `maxbytes` bytes, shared by all
+        objects. The cache is available as the ``cache`` attribute of the
+        method as read from the class. E.g.::
+
+            class C:
+                @lrumethod(1 << 20)
+                def m(self):
+                    return self.some_expensive_calculation()
+
+            C.m.cache.clear()
+    '''
+    return lambda f: LRUMethod(f, LRUCache(maxbytes))
+
+class LRUMethod:
+
+    def __init__(self, f, cache:LRUCache):
+        self.f = f
+        self.name = self.f.__name__
+        self.cache = cache
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:  return self
+        return MethodType(self, obj)
 
+    def __call__(self, obj):
+        value = self.cache.get(obj, _MISSING)
+        if value is _MISSING:
+            value = self.f(obj)
+            self.cache.put(obj, value)
+        return value
@@ -0,0 +1,132 @@
+''' Parsers to generate a formula `Fm` from text.
+
+    `parse()` accepts the infix notation produced by `str()` of a formula,
+    e.g. ``(¬ψ → ¬φ) → (φ → ψ)``, and `parsepn()` accepts Polish (prefix)
+    notation, e.g., ``→→¬ψ¬φ→φψ``.
+
+    Both parsers make a single pass over the input using explicit stacks
+    rather than recursive descent, so they run in time linear in the
+    length of the input and can parse formulae of any depth without
+    running into Python's recursion limit. Since `Fm` nodes are interned,
+    repeated subformulae in the input all produce the same node.
+'''
+
+from    formula  import *
+from    typing  import List, Optional, Tuple
+
+class ParseError(ValueError):
+    ''' The text could not be parsed as a formula. `pos` is the (0-based)
+        index into the text at which the error was detected.
+    '''
+    def __init__(self, msg:str, pos:int):
+        super().__init__(f'{msg} at position {pos}')
+        self.pos = pos
+
+def parse(s:str) -> Fm:
+    ''' Parse `s`, a formula in the infix notation produced by `Fm.__str__`,
+        returning the formula `Fm`.
+
+        >>> parse('(A ∧ B) → ¬(A → ¬B)') is Im(Fm('∧', A, B), No(Im(A, No(B))))
+        True
+
+        Variables are single letters, ``¬`` is the only monadic connective
+        and any other character valid as a connective for `Fm` (see
+        `Fm.valtype()`) is a dyadic connective. Whitespace is ignored.
+
+        The dyadic connectives have no precedence or associativity, so
+        every dyadic subformula of another formula must be parenthesised,
+        as `Fm.__str__` does. Thus, e.g., ``A → B → C`` is rejected as
+        ambiguous. Redundant parentheses, e.g. ``((A))``, are allowed.
+    '''
+    #   The current group (parenthesised expression, or the whole input
+    #   at the outermost level) being parsed is held in these variables;
+    #   when we start a new group we push them on to `stack`.
+    lhs:Optional[Fm] = None     # left operand, or the whole group so far
+    op:Optional[str] = None     # dyadic connective waiting for right operand
+    negs = 0                    # count of ¬ waiting for operand
+    done = False                # group has had its (only) dyadic connective
+    stack:List[Tuple[Optional[Fm], Optional[str], int, bool, int]] = []
+
+    for pos, c in enumerate(s):
+        if c.isspace():
+            continue
+        elif c.isalpha() or c == ')':
+            if c == ')':
+                if not stack:
+                    raise ParseError("unmatched ')'", pos)
+                if lhs is None or op is not None:
+                    raise ParseError('expected formula', pos)
+                x = lhs
+                lhs, op, negs, done, _ = stack.pop()
+            else:
+                if lhs is not None and op is None:
+                    raise ParseError('expected connective', pos)
+                x = Fm(c)
+            for _ in range(negs):  x = Fm('¬', None, x)
+            negs = 0
+            if op is None:
+                lhs = x
+            else:
+                lhs = Fm(op, lhs, x); op = None; done = True
+        elif lhs is not None and op is None:
+            #   Following a complete operand; must be a dyadic connective.
+            try:
+                ty = Fm.valtype(c)
+            except ValueError:
+                raise ParseError(f'bad character {c!r}', pos) from None
+            if ty is not Fm.DYADIC or c == '(':
+                raise ParseError('expected connective', pos)
+            if done:
+                raise ParseError(
+                    'ambiguous connective (parentheses needed)', pos)
+            op = c
+        elif c == '(':
+            stack.append((lhs, op, negs, done, pos))
+            lhs = None; op = None; negs = 0; done = False
+        elif c == '¬':
+            negs += 1
+        else:
+            raise ParseError('expected formula', pos)
+
+    if stack:
+        raise ParseError("unmatched '('", stack[-1][4])
+    if lhs is None or op is not None:
+        raise ParseError('expected formula', len(s))
+    return lhs
+
+def parsepn(s:str) -> Fm:
+    ''' Parse `s`, a formula in Polish (prefix) notation, returning the
+        formula `Fm`. Whitespace is ignored; parentheses are not used.
+
+        >>> parsepn('→ →¬ψ¬φ →φψ') is Im(Im(No(ψ), No(φ)), Im(φ, ψ))
+        True
+
+        This scans the text from right to left so that every connective
+        has its operands already parsed (on the stack) when it's reached.
+    '''
+    stack:List[Fm] = []
+    poss:List[int] = []         # start position of each formula on `stack`
+    for pos in range(len(s) - 1, -1, -1):
+        c = s[pos]
+        if c.isspace():  continue
+        try:
+            ty = Fm.valtype(c)
+        except ValueError:
+            raise ParseError(f'bad character {c!r}', pos) from None
+        if ty is Fm.VAR:
+            stack.append(Fm(c))
+        elif ty is Fm.MONADIC:
+            if not stack:
+                raise ParseError(f'missing operand for {c!r}', pos)
+            stack[-1] = Fm(c, None, stack[-1]); poss.pop()
+        else:
+            if len(stack) < 2:
+                raise ParseError(f'missing operand for {c!r}', pos)
+            left = stack.pop(); poss.pop()
+            stack[-1] = Fm(c, left, stack[-1]); poss.pop()
+        poss.append(pos)
+    if not stack:
+        raise ParseError('expected formula', len(s))
+    if len(stack) > 1:
+        raise ParseError('unexpected formula', poss[-2])
+    return stack[0]
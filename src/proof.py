@@ -1,31 +1,41 @@
 ''' A `Proof` is a list of axiom schema, a list of additional axioms (or
     "givens"), and a list of `Step`s, each of which is an `Axiom`
     instantiated from an axiom schema, a `Given` from the list of
-    additional axioms, or a modus ponens inference `MP`.
+    additional axioms, a modus ponens inference `MP`, or a `Lemma`
+    instantiated from the assertion of another proof.
 
     The `Step`s do not have specified formulae, but each one generates
     a formula based on its specified derivation:
     - the given axiom for a `Given`;
     - an axiom instantiated from a `Schema` via substitution for an `Axiom`;
     - a consequent of an MP inference that is the right-hand side of the
-      major premise (a previous step) it references.
+      major premise (a previous step) it references;
+    - the assertion of another proof via substitution for a `Lemma`.
 
     The `Proof.valid` property is `True` or `False` depending on whether
     the proof is valid or not; each step also has a `Step.valid` property.
+    The `Proof` caches each step's formula and validity, and a proof may
+    be edited by appending, replacing or truncating steps; after an edit
+    only the steps affected by it are rechecked.
     All this really checks is that the minor premise of the `MP` steps
     matches the left hand side of the major premise; steps can otherwise be
     invalid only if improperly constructed (e.g., providing not enough or
     too many substitutions for an axiom schema, or referencing a step that
     doesn't exist before the current step) and it's not possible to
     instantiate such `Proof` objects as the constructor will throw an
-    error in cases like this.
+    error in cases like this. (A `LazyProof` checks this only for the steps
+    that the final step depends on, when they are first needed.)
 '''
 
 from    formula  import *
 from    schema  import Schema
 
-from    abc  import abstractmethod, abstractproperty
+from    abc  import abstractmethod
+from    array  import array
+from    copy  import copy
+from    random  import Random
 from    typing  import Iterable, List, Optional
+import  truth
 
 #   The problem asks for a system using one fixed list of axiom schema,
 #   but I parametrize it here because I'd like to try out some different
@@ -39,13 +49,13 @@ AXIOMS = {
         Im(Im(No(ψ), No(φ)),            #     (¬ψ → ¬φ) → (φ → ψ)
            Im(   φ ,    ψ )),
     ))),
-    'L': (
+    'L': tuple(map(Schema, (
         Im(A, Im(B, A)),                #              A → (B → A)
         Im(Im(A, Im(B, C)),             #  (A → (B → C)) → ((A → B) → (A → C))
            Im(Im(A, B), Im(A, C))),
         Im(Im(No(B), No(A)),            #      (¬B → ¬A) → ((¬B → A) → B)
            Im(Im(No(B), A), B)),
-    ),
+    ))),
 }
 ''' A `dict` of axiom `Schema` tuples indexed by logic name.
 
@@ -54,8 +64,8 @@ AXIOMS = {
     - ``L``: Propositional calculus System L from Chapter 1 of Hirst and
       Hirst, *A Primer for Logic and Proof.*
 '''
-#   XXX It would be really nice for the above to verify with truth tables
-#   that the axioms are tautologies.
+#   That all of the above are tautologies is checked with truth tables
+#   (see the `truth` module) in the tests.
 
 ####################################################################
 #   Steps
@@ -66,6 +76,10 @@ class Step():
         (This is abstract; only the subclasses are instantiated.)
     '''
 
+    #   Proofs can have very many steps, so we use slots rather than
+    #   a per-instance `__dict__` to save memory.
+    __slots__ = ('_proof', '_step')
+
     def __init__(self):
         #   The link back to the Proof and the step number is filled
         #   when a Step is added to a Proof. Given that use of a Step
@@ -92,13 +106,38 @@ class Step():
         '''
         return self._step
 
-    @abstractproperty
+    @abstractmethod
+    def __reduce__(self):
+        ''' Steps are pickled (and copied) without the `Proof` they're
+            in, so a copy of a step may be used in another proof.
+        '''
+
+    @property
+    def refs(self) -> tuple[int, ...]:
+        ' The step numbers of the previous steps this step references. '
+        return ()
+
+    @property
     def fm(self) -> Fm:
-        ' The formula generated by this step. '
+        ''' The formula generated by this step. This is computed (by
+            `_derive()`) only once and cached by the `Proof`.
+        '''
+        return self._proof._fm(self._step)
 
-    @abstractproperty
+    @property
     def valid(self) -> bool:
-        ' Whether this step within a proof is valid. '
+        ''' Whether this step within a proof is valid. This is computed (by
+            `_check()`) only once and cached by the `Proof`.
+        '''
+        return self._proof._valid(self._step)
+
+    @abstractmethod
+    def _derive(self) -> Fm:
+        ' Compute the formula generated by this step. '
+
+    @abstractmethod
+    def _check(self) -> bool:
+        ' Compute whether this step is valid. '
 
 class Given(Step):
     ''' A use of an assumption given as part of a proof,
@@ -111,6 +150,8 @@ class Given(Step):
         from `Axiom` than `Assumption`. It also happens to make for
         easier completion.)
     '''
+    __slots__ = ('_index',)
+
     def __init__(self, index:int):
         self._index = index
         super().__init__()
@@ -118,6 +159,9 @@ class Given(Step):
     def __repr__(self) -> str:
         return 'Given(' + str(self.index) + ')'
 
+    def __reduce__(self):
+        return (Given, (self._index,))
+
     @property
     def index(self) -> int:
         ''' Index (1-based) in the list of assumptions given to this step's
@@ -125,12 +169,10 @@ class Given(Step):
         '''
         return self._index
 
-    @property
-    def fm(self) -> Fm:
+    def _derive(self) -> Fm:
         return self._proof.given(self.index)
 
-    @property
-    def valid(self) -> bool:
+    def _check(self) -> bool:
         ''' A `Given` line is always valid. (That it references one of the
             `givens` of the proof is checked during `Proof` construction.)
         '''
@@ -140,17 +182,27 @@ class Axiom(Step):
     ''' A use of an axiom as a step in a `Proof`. The axiom is generated
         from the specified index of an axiom `Schema` and a list (any
         `Iterable`) of formulae `Fm` to be substituted for each metavariable.
+
+        Alternatively, the formula that the step asserts may be given as
+        `fm`, in which case the substitutions may be omitted. The step is
+        then valid if `fm` matches the schema (and the substitutions, if
+        given, are those of the match); see `Schema.match()`. This avoids
+        both having to know the substitutions and instantiating the schema
+        to check them.
     '''
+    __slots__ = ('_index', '_substitutions', '_asserted')
 
     #   XXX Surely there's a more concise way of dealing with the
     #   substitutions iterable being optional.
-    def __init__(self, index:int, substitutions:Optional[Iterable[Fm]]=None):
+    def __init__(self, index:int, substitutions:Optional[Iterable[Fm]]=None,
+            fm:Optional[Fm]=None):
         self._index:int = index
         if substitutions is None:
             self._substitutions = None
         else:
             self._substitutions = tuple(substitutions)
-        self._fm:Optional[Fm] = None
+        self._asserted:Optional[Fm] = fm
+        super().__init__()
 
     def __repr__(self) -> str:
         i = str(self._index)
@@ -158,8 +210,13 @@ class Axiom(Step):
             sb = ''
         else:
             sb = ',(' + ','.join(map(str, self._substitutions)) + ')'
+        if self._asserted is not None:
+            sb += f',fm={self._asserted}'
         return f'Axiom({i}{sb})'
 
+    def __reduce__(self):
+        return (Axiom, (self._index, self._substitutions, self._asserted))
+
     @property
     def index(self) -> int:
         ''' Index (1-based) in the list of axiom schema given to this
@@ -167,24 +224,25 @@ class Axiom(Step):
         '''
         return self._index
 
-    @property
-    def fm(self) -> Fm:
-        if self._fm is None:        # lazy instantiation
-            self._fm = self._proof \
-                .axiom_schema(self._index).sub(self._substitutions)
-        return self._fm
+    def _derive(self) -> Fm:
+        if self._asserted is not None:  return self._asserted
+        return self._proof.axiom_schema(self._index).sub(self._substitutions)
 
-    @property
-    def valid(self) -> bool:
-        ''' An `Axiom` line is always valid. (That it references one of the
-            axiom `Schema` of the proof is checked during `Proof`
-            construction.)
+    def _check(self) -> bool:
+        ''' An `Axiom` line with no asserted formula is always valid. (That
+            it references one of the axiom `Schema` of the proof is checked
+            during `Proof` construction.) One with an asserted formula is
+            valid if the formula matches the schema.
         '''
-        return True
+        if self._asserted is None:  return True
+        subs = self._proof.axiom_schema(self._index).match(self._asserted)
+        if subs is None:  return False
+        return self._substitutions is None or self._substitutions == subs
 
 class MP(Step):
     ''' A use of the modus ponens inference as a step in a `Proof`.
     '''
+    __slots__ = ('_min', '_maj')
 
     class MPError(ValueError):
         ' Major premise main connective is not an implication. '
@@ -222,6 +280,13 @@ class MP(Step):
     def __repr__(self) -> str:
         return f'MP({self.min},{self.maj})'
 
+    def __reduce__(self):
+        return (MP, (self._min, self._maj))
+
+    @property
+    def refs(self) -> tuple[int, ...]:
+        return (self._min, self._maj)
+
     @property
     def min(self) -> int:
         'The step number of the minor premise.'
@@ -235,7 +300,7 @@ class MP(Step):
     @property
     def minfm(self) -> Fm:
         ' The formula of the minor premise. '
-        return self._proof.step(self.min).fm
+        return self._proof._fm(self._min)
 
     @property
     def majfm(self) -> Fm:
@@ -244,8 +309,8 @@ class MP(Step):
             the AST) that divides it into an antecedent and a consequent.
             If it does not, an `MPError` will be raised.
         '''
-        f = self.proof.step(self.maj).fm
-        if f.value != '→':
+        f = self._proof._fm(self._maj)
+        if f._value != '→':
             raise self.MPError('Major premise main connective'
                 f' is not an implication (→): {f}')
         return f
@@ -258,14 +323,59 @@ class MP(Step):
     def consequent(self) -> Fm:
         return self.majfm.right
 
-    @property
-    def fm(self) -> Fm:
+    def _derive(self) -> Fm:
         return self.consequent
 
-    @property
-    def valid(self) -> bool:
+    def _check(self) -> bool:
         return self.minfm == self.antecedent
 
+class Lemma(Step):
+    ''' A use of a lemma as a step in a `Proof`. A lemma is another proof,
+        with no givens, and the step is an instance of its assertion,
+        generated from the specified index in the list of lemmas of this
+        step's `Proof` and a list (any `Iterable`) of formulae `Fm` to be
+        substituted for each variable of the assertion, in order of
+        appearance, as with an `Axiom` (and, as with an `Axiom`, if no
+        substitutions are given the step asserts the assertion itself).
+
+        The step is valid if the lemma is valid. Since the axioms of a
+        proof are schema, substituting for variables throughout a proof
+        with no givens gives another valid proof, so every instance of a
+        valid lemma's assertion is a theorem. Thus, like a theorem used in
+        a Metamath proof, a lemma is checked only once however many times
+        it is used, rather than its steps being repeated (and checked
+        again) for each use.
+    '''
+    __slots__ = ('_index', '_substitutions')
+
+    def __init__(self, index:int, substitutions:Optional[Iterable[Fm]]=None):
+        self._index:int = index
+        self._substitutions = None if substitutions is None \
+            else tuple(substitutions)
+        super().__init__()
+
+    def __repr__(self) -> str:
+        if self._substitutions is None:  return f'Lemma({self._index})'
+        return f'Lemma({self._index},(' \
+            + ','.join(map(str, self._substitutions)) + '))'
+
+    def __reduce__(self):
+        return (Lemma, (self._index, self._substitutions))
+
+    @property
+    def index(self) -> int:
+        ' Index (1-based) in the list of lemmas of this step\'s `Proof`. '
+        return self._index
+
+    def _derive(self) -> Fm:
+        return self._proof._lemmaschema(self._index).sub(self._substitutions)
+
+    def _check(self) -> bool:
+        try:
+            return self._proof.lemma(self._index).valid
+        except MP.MPError:
+            return False
+
 ####################################################################
 #   Proofs
 
@@ -275,7 +385,17 @@ class Proof:
 
         The first two may be supplied as any `Iterable`. The third is an
         `Iterable` of pairs (2-`tuple`s) of an `int` step number and a
-        `Step` object. See `StepsArg` below for more details.
+        `Step` object. See `StepsArg` below for more details. The optional
+        fourth is an `Iterable` of the proofs that `Lemma` steps may use;
+        these must have no givens and the same axiom schema as this proof,
+        and must not be edited while they are in use.
+
+        Once constructed, a proof may be edited with `append()`,
+        `replace()` and `truncate()`. The formula and validity of each step
+        is cached, and after an edit only the changed steps and the steps
+        that depend on them (directly or indirectly) are rechecked, so
+        checking the validity of an edited proof is cheap even when it has
+        very many steps.
 
         A `Proof` instantiation does not (currently) include the final
         formula that is expected to be what the proof asserts; the
@@ -301,29 +421,89 @@ class Proof:
     def __init__(self,
         axiom_schema:Iterable[Schema],
         givens:Iterable[Fm],
-        steps:StepsArg
+        steps:StepsArg,
+        lemmas:Iterable["Proof"]=(),
     ):
         self._axiom_schema:tuple[Schema, ...] = tuple(axiom_schema)
         self._givens:tuple[Fm, ...] = tuple(givens)
-        self._steps:tuple[Step, ...] = self._countsteps(steps)
+        self._lemmas:tuple[Proof, ...] = tuple(lemmas)
+        self._lschemas:List[Optional[Schema]] = [None] * len(self._lemmas)
+        schemafms = [ sc.fm for sc in self._axiom_schema ]
+        for i, lm in enumerate(self._lemmas, 1):
+            if lm._givens:
+                raise ValueError(f'lemma {i} has givens')
+            if [ sc.fm for sc in lm._axiom_schema ] != schemafms:
+                raise ValueError(f'lemma {i} has different axiom schema')
+        #   Per-step data, indexed by step number - 1.
+        self._steps:List[Step] = []
+        self._fms:List[Optional[Fm]] = []       # cached formulae
+        self._ok:List[Optional[bool]] = []      # cached validity
+        self._users:List[List[int]] = []        # steps referencing this one
+        self._dirty:set[int] = set()            # steps with validity unknown
+        self._nbad = 0                          # count of invalid steps
+        self._countsteps(steps)
 
     class StepError(ValueError):
         ' The sequence of steps was not monotonically increasing from 1. '
 
+    def __reduce__(self):
+        ''' A proof is pickled as just its axiom schema, givens and steps,
+            (and lemmas, if any, which are pickled as proofs themselves),
+            without the cached formulae and validity of the steps, which
+            are rebuilt as needed in the unpickling process. All the
+            formulae in the proof (schema, givens, and the substitutions
+            and asserted formulae of `Axiom` steps) are pickled together
+            as a single `flatten()`ed table, so that subformulae they share
+            are pickled only once. This keeps pickles small and fast for
+            sending proofs between processes.
+        '''
+        fms:List[Fm] = [ sc.fm for sc in self._axiom_schema ]
+        fms.extend(self._givens)
+        def ref(f:Optional[Fm]) -> Optional[int]:
+            if f is None:  return None
+            fms.append(f);  return len(fms) - 1
+        steps:List[tuple] = []
+        for st in self._steps:
+            if isinstance(st, Axiom):
+                subs = st._substitutions
+                steps.append((Axiom, st._index,
+                    None if subs is None else tuple(map(ref, subs)),
+                    ref(st._asserted)))
+            elif isinstance(st, Lemma):
+                subs = st._substitutions
+                steps.append((Lemma, st._index,
+                    None if subs is None else tuple(map(ref, subs))))
+            else:
+                steps.append(st.__reduce__())
+        args:tuple = (len(self._axiom_schema), len(self._givens),
+                      flatten(fms), tuple(steps))
+        if type(self) is not Proof or self._lemmas:  args += (type(self),)
+        if self._lemmas:  args += (self._lemmas,)
+        return (_unpickle, args)
+
     class InternalError(RuntimeError): '@private'
 
-    def _countsteps(self, ss:StepsArg) -> tuple[Step, ...]:
-        ei = 1; steps:List[Step] = []
+    def _countsteps(self, ss:StepsArg) -> None:
+        ei = 1
         for i, s in ss:
             if i == ei:
                 ei += 1
-                steps.append(self._validate(i, s))
+                self._add(self._validate(i, s))
             else:
                 raise self.StepError(
                     f'Expected step {ei} but got step {i}: {s}')
-        if len(steps) == 0:
+        if len(self._steps) == 0:
             raise ValueError('steps may not be empty')
-        return tuple(steps)
+
+    def _add(self, s:Step) -> None:
+        ' Add validated step `s` to the end of the proof. '
+        n = len(self._steps) + 1
+        self._steps.append(s)
+        self._fms.append(None)
+        self._ok.append(None)
+        self._users.append([])
+        self._dirty.add(n)
+        for r in s.refs:  self._users[r-1].append(n)
 
     def _validate(self, i:int, s:Step) -> Step:
         ''' Validate `s` as step `i` of this `Proof` and return it updated
@@ -350,6 +530,10 @@ class Proof:
             if not s.min in prev or not s.maj in prev:
                 raise self.StepError(
                     f'Step {i} {s} references non-existent previous steps')
+        elif isinstance(s, Lemma):
+            if not 0 < s.index <= len(self._lemmas):
+                raise self.StepError(f'Step {i} {s}'
+                    f' references non-existent lemma index {s.index}')
         else:
             raise self.InternalError()
 
@@ -357,6 +541,104 @@ class Proof:
         s._step = i
         return s
 
+    ################################################################
+    #   Editing
+
+    def append(self, step:Step) -> None:
+        ' Add `step` to the end of the proof. '
+        self._add(self._validate(len(self._steps) + 1, step))
+
+    def replace(self, n:int, step:Step) -> None:
+        ''' Replace step `n` of the proof with `step`. This and all steps
+            that depend on it will be rechecked.
+        '''
+        if not 1 <= n <= len(self._steps):
+            raise self.StepError(f'No step {n} to replace')
+        self._validate(n, step)
+        self._unlink(n)
+        for r in step.refs:  self._users[r-1].append(n)
+        self._steps[n-1] = step
+        self._invalidate(n)
+
+    def truncate(self, n:int) -> None:
+        ' Remove all steps after step `n`. '
+        if not 1 <= n <= len(self._steps):
+            raise self.StepError(f'Cannot truncate to {n} steps')
+        #   The removed step is usually the last of its premises' users,
+        #   and popped. Users lists needn't be in order (`replace()`
+        #   appends), so any other list is filtered, once: removing each
+        #   user from it in turn would be quadratic in its length.
+        users = self._users; unsorted = set()
+        for k in range(len(self._steps), n, -1):
+            for r in self._steps[k-1].refs:
+                if not 1 <= r <= n:  continue
+                if users[r-1] and users[r-1][-1] == k:  users[r-1].pop()
+                else:  unsorted.add(r)
+            if self._ok[k-1] is False:  self._nbad -= 1
+            self._dirty.discard(k)
+        for r in unsorted:
+            users[r-1] = [ u for u in users[r-1] if u <= n ]
+        del self._steps[n:], self._fms[n:], self._ok[n:], self._users[n:]
+
+    def _unlink(self, n:int) -> None:
+        ' Remove step `n` from the users of the steps it references. '
+        for r in self._steps[n-1].refs:  self._users[r-1].remove(n)
+
+    def _invalidate(self, n:int) -> None:
+        ''' Drop the cached formula and validity of step `n` and all steps
+            that depend on it, directly or indirectly.
+        '''
+        stack = [n]
+        while stack:
+            k = stack.pop()
+            if k in self._dirty and self._fms[k-1] is None:  continue
+            self._fms[k-1] = None
+            if self._ok[k-1] is False:  self._nbad -= 1
+            self._ok[k-1] = None
+            self._dirty.add(k)
+            stack.extend(self._users[k-1])
+
+    ################################################################
+    #   Step formulae and validity
+
+    def _fm(self, n:int) -> Fm:
+        ''' Return the formula of step `n`, deriving it (and any of the
+            formulae it depends on) if it's not already cached.
+        '''
+        fms = self._fms
+        f = fms[n-1]
+        if f is not None:  return f
+        #   Usually the steps this references have already been derived.
+        s = self._steps[n-1]
+        for r in s.refs:
+            if fms[r-1] is None:  break
+        else:
+            f = fms[n-1] = s._derive()
+            return f
+        #   Find all the uncached steps this depends on and derive them in
+        #   step order, so every step's references are already cached and
+        #   deriving a long chain of MPs doesn't recurse.
+        need = []; stack = [n]; seen = set()
+        while stack:
+            k = stack.pop()
+            if k in seen or self._fms[k-1] is not None:  continue
+            seen.add(k); need.append(k)
+            stack.extend(self._steps[k-1].refs)
+        for k in sorted(need):
+            self._fms[k-1] = self._steps[k-1]._derive()
+        return self._fms[n-1]       # type: ignore [return-value]
+
+    def _valid(self, n:int) -> bool:
+        ' Return the validity of step `n`, checking it if necessary. '
+        ok = self._ok[n-1]
+        if ok is None:
+            ok = self._ok[n-1] = self._steps[n-1]._check()
+            if not ok:  self._nbad += 1
+            self._dirty.discard(n)
+        return ok
+
+    ################################################################
+
     def axiom_schema(self, n:int) -> Schema:
         ''' Return the `n`th axiom schema in the list of axiom schema
             available to this proof.
@@ -373,6 +655,22 @@ class Proof:
         '''
         return self._givens[n-1]
 
+    def lemma(self, n:int) -> "Proof":
+        ''' Return the `n`th of the lemmas available to this proof.
+
+            Note that indicies start at 1, not 0.
+        '''
+        return self._lemmas[n-1]
+
+    def _lemmaschema(self, n:int) -> Schema:
+        ''' The assertion of lemma `n` as a `Schema`, to be instantiated by
+            `Lemma` steps. This is created when first used.
+        '''
+        sc = self._lschemas[n-1]
+        if sc is None:
+            sc = self._lschemas[n-1] = Schema(self._lemmas[n-1].assertion)
+        return sc
+
     def step(self, n:int) -> Step:
         ''' Return step `n` of the proof.
 
@@ -393,11 +691,332 @@ class Proof:
 
     @property
     def valid(self) -> bool:
-        ' `True` if the proof is valid, `False` if not. '
-        return all(map(lambda s: getattr(s, 'valid'), self._steps))
+        ''' `True` if the proof is valid, `False` if not. Only steps that
+            have not been checked since they were added or affected by an
+            edit are checked, and checking stops at the first invalid step,
+            so the formulae of the steps after it need not be derived.
+        '''
+        if self._nbad:  return False
+        for k in sorted(self._dirty):
+            if not self._valid(k):  return False
+        return True
+
+    def prefilter(self, samples:int=64, rng:Optional[Random]=None) -> bool:
+        ''' A semantic check that quickly rejects many invalid proofs.
+            Return `False` if the proof is certainly invalid, or `True` if
+            it may be valid, in which case `valid` must be checked.
+
+            Every `Axiom` step is an instance of an axiom schema, which is
+            a tautology (assuming, as with all of `AXIOMS`, that the
+            schema are tautologies), as is every `Lemma` step that is valid
+            (being a theorem), and every `MP` step that does not depend
+            (directly or indirectly) on a `Given` step derives a tautology
+            from tautologies. So if any of these steps is false under some
+            assignment to its variables, some step in the proof is invalid.
+            This evaluates these steps in order under the same `samples`
+            random assignments (see `truth.Sampler`), stopping at the first
+            that is false under any of them, so the formulae of the steps
+            after it are never derived. Any of these `MP` steps whose
+            major premise is not an implication also makes it return
+            `False`. An `Axiom` step with the wrong number of substitutions
+            is skipped (as are the steps that depend on it), leaving it to
+            `valid` to deal with.
+
+            As `valid` also stops at the first invalid step and compares
+            interned formulae, which is very fast, the truth-value
+            evaluation is worth doing only for unusually expensive proofs.
+            See ``tool/bench_prefilter.py``.
+        '''
+        return self._prefilter(range(1, len(self._steps) + 1), samples, rng)
+
+    def _prefilter(self, ns:Iterable[int], samples:int,
+                   rng:Optional[Random]) -> bool:
+        ''' `prefilter()` considering only steps `ns`, in increasing order,
+            which must include the premises of any `MP` step among them.
+        '''
+        taut = bytearray(len(self._steps))
+        value = truth.Sampler(samples, rng)
+        for n in ns:
+            s = self._steps[n-1]
+            if isinstance(s, Given):  continue
+            if isinstance(s, MP) and not (taut[s.min-1] and taut[s.maj-1]):
+                continue
+            try:
+                f = self._fm(n)
+            except MP.MPError:
+                return False
+            except ValueError:
+                continue            # wrong number of substitutions
+            try:
+                if value(f) != value.mask:  return False
+            except ValueError:
+                return True         # connectives we can't evaluate
+            taut[n-1] = 1
+        return True
+
+    def validity(self) -> bytearray:
+        ''' Return the validity of every step of the proof as a bitmap:
+            item ``n-1`` is 1 if step ``n`` is valid and 0 if not. An `MP`
+            step whose major premise is not an implication is invalid
+            here, rather than raising `MP.MPError`.
+
+            The steps are checked in order, so each step's formula is
+            derived only after those of the steps it references, and
+            each is derived and checked at most once. As with `valid`,
+            only steps not checked since they were last changed are
+            checked. With interned formulae each check is a constant-time
+            comparison, so checking a large proof costs little more than
+            deriving its formulae.
+        '''
+        bits = bytearray(len(self._steps))
+        for n in range(1, len(self._steps) + 1):
+            try:
+                bits[n-1] = self._valid(n)
+            except MP.MPError:
+                pass
+        return bits
+
+    ################################################################
+    #   Transformations
+
+    def rmunused(self) -> "Proof":
+        ''' Return a new proof with only the steps that the final step
+            depends on, directly or indirectly, renumbering the steps and
+            the references of the `MP` steps to match. (This is the same
+            as `unused.rmunused()`.) The new proof shares this proof's
+            axiom schema and givens, and the cached formulae of the steps
+            it keeps.
+        '''
+        return self._rebuild(array('L', range(1, len(self._steps) + 1)))
+
+    def compact(self) -> "Proof":
+        ''' Return a new proof with duplicate steps merged and unused steps
+            removed. Wherever several steps generate the same formula (from
+            the same `Axiom` instantiation, a repeated `Given`, an `MP` of
+            the same premises, or even different derivations), only the
+            first is kept and references to the others are changed to
+            reference it. Then, as with `rmunused()`, only the steps that
+            the final step depends on are kept.
+
+            Only steps that are valid and depend only on valid steps are
+            merged, so the new proof is valid if and only if the final step
+            of this one and all the steps it depends on are valid, and it
+            asserts the same formula.
+
+            Since formulae are interned, duplicates are found with a `dict`
+            keyed on the formulae themselves, so this takes time linear in
+            the number of steps (plus that of deriving any uncached
+            formulae).
+        '''
+        steps = self._steps
+        rep = array('L', range(1, len(steps) + 1))
+        sound = bytearray(len(steps))
+        first:dict[Fm, int] = {}
+        for n, s in enumerate(steps, 1):
+            try:
+                if not self._valid(n):  continue
+            except MP.MPError:
+                continue
+            if not all( sound[r-1] for r in s.refs ):  continue
+            sound[n-1] = 1
+            rep[n-1] = first.setdefault(self._fm(n), n)
+        return self._rebuild(rep)
+
+    def _rebuild(self, rep:array) -> "Proof":
+        ''' Return a new proof with the steps the final step depends on,
+            where ``rep[n-1]`` is the number of the step to be used in
+            place of step ``n``, which must generate the same formula.
+
+            The used steps are marked in a `bytearray` using a worklist,
+            so each step is visited at most once and long chains of
+            references do not recurse, and the new step numbers are
+            assigned in a single forward pass.
+        '''
+        steps = self._steps
+        used = bytearray(len(steps))
+        last = rep[-1]
+        used[last-1] = 1
+        work = [last]
+        while work:
+            for r in steps[work.pop()-1].refs:
+                r = rep[r-1]
+                if not used[r-1]:
+                    used[r-1] = 1
+                    work.append(r)
+        newnum = array('L', [0]) * len(steps)
+        kept:List[Step] = []; fms:List[Optional[Fm]] = []
+        for n, s in enumerate(steps[:last], 1):
+            if not used[n-1]:  continue
+            kept.append(MP(newnum[rep[s.min-1]-1], newnum[rep[s.maj-1]-1])
+                        if isinstance(s, MP) else copy(s))
+            fms.append(self._fms[n-1])
+            newnum[n-1] = len(kept)
+        pr = Proof(self._axiom_schema, self._givens, enumerate(kept, 1),
+                   self._lemmas)
+        pr._fms = fms
+        return pr
 
     def __str__(self) -> str:
         return '\n'.join(
             f'{i}:  ⊢ {str(s.fm):52} {"from " + str(s):>20}'
                 for i, s in self.steps
         )
+
+class LazyProof(Proof):
+    ''' A `Proof` whose steps are validated only when they are needed.
+
+        The constructor checks only the numbering of the steps, recording
+        each as given. A step is validated (as by the `Proof` constructor)
+        and bound to the proof when it is first reached from a step that
+        is used: the step returned by `step()`, the final step (for
+        `assertion` and `valid`) and so on. Binding a step binds all the
+        steps it depends on, directly or indirectly, its *cone*, so steps
+        outside the cone of the final step are never validated, nor their
+        formulae derived. This saves most of the work of checking
+        generated proofs with many dead steps.
+
+        `valid` and `prefilter()` consider only the final step and the
+        steps in its cone; steps outside the cone, even ones referencing
+        non-existent steps or axioms, do not affect them. `rmunused()`
+        binds only the cone of the final step, and returns a (plain)
+        `Proof` of just those steps. Other operations on the whole proof,
+        such as `steps`, `validity()` and `compact()`, bind every step and
+        so raise `StepError` for a malformed one, as the `Proof`
+        constructor would.
+    '''
+
+    def __init__(self,
+        axiom_schema:Iterable[Schema],
+        givens:Iterable[Fm],
+        steps:Proof.StepsArg,
+        lemmas:Iterable[Proof]=(),
+    ):
+        self._bound = bytearray()               # 1 if step is validated
+        super().__init__(axiom_schema, givens, steps, lemmas)
+
+    def _countsteps(self, ss:Proof.StepsArg) -> None:
+        ei = 1
+        for i, s in ss:
+            if i != ei:
+                raise self.StepError(
+                    f'Expected step {ei} but got step {i}: {s}')
+            ei += 1
+            self._steps.append(s)
+            self._fms.append(None)
+            self._ok.append(None)
+            self._users.append([])
+        if len(self._steps) == 0:
+            raise ValueError('steps may not be empty')
+        self._bound = bytearray(len(self._steps))
+
+    def _bindcone(self, n:int) -> None:
+        ''' Validate and bind step `n` and all the unbound steps it depends
+            on. Nothing is bound unless all of them are valid, so every
+            bound step references only bound steps.
+        '''
+        bound = self._bound
+        if bound[n-1]:  return
+        cone = []; stack = [n]; seen = {n}
+        while stack:
+            k = stack.pop()
+            s = self._validate(k, self._steps[k-1])
+            cone.append(k)
+            for r in s.refs:
+                if not bound[r-1] and r not in seen:
+                    seen.add(r); stack.append(r)
+        for k in cone:
+            bound[k-1] = 1
+            self._dirty.add(k)
+            for r in self._steps[k-1].refs:  self._users[r-1].append(k)
+
+    def _bindall(self) -> None:
+        for n in range(1, len(self._steps) + 1):  self._bindcone(n)
+
+    def _add(self, s:Step) -> None:
+        for r in s.refs:  self._bindcone(r)
+        super()._add(s)
+        self._bound.append(1)
+
+    def replace(self, n:int, step:Step) -> None:
+        if 1 <= n <= len(self._steps) and not self._bound[n-1]:
+            #   Nothing bound depends on an unbound step.
+            self._steps[n-1] = step
+            return
+        if 1 <= n <= len(self._steps):
+            for r in self._validate(n, step).refs:  self._bindcone(r)
+        super().replace(n, step)
+
+    def truncate(self, n:int) -> None:
+        super().truncate(n)
+        del self._bound[n:]
+
+    def _unlink(self, n:int) -> None:
+        if self._bound[n-1]:  super()._unlink(n)
+
+    def _fm(self, n:int) -> Fm:
+        if not self._bound[n-1]:  self._bindcone(n)
+        return super()._fm(n)
+
+    def _valid(self, n:int) -> bool:
+        if not self._bound[n-1]:  self._bindcone(n)
+        return super()._valid(n)
+
+    def step(self, n:int) -> Step:
+        if not self._bound[n-1]:  self._bindcone(n)
+        return self._steps[n-1]
+
+    @property
+    def steps(self) -> tuple[tuple[int, Step], ...]:
+        self._bindall()
+        return super().steps
+
+    @property
+    def valid(self) -> bool:
+        ''' `True` if the final step and all the steps it depends on are
+            valid, `False` if not. The steps of the cone are checked in
+            order, stopping at the first invalid one.
+        '''
+        for k in self._cone():
+            if not self._valid(k):  return False
+        return True
+
+    def _cone(self) -> list[int]:
+        ''' Bind the final step and return, in order, the numbers of it and
+            the steps in its cone. As references are always to earlier
+            steps, the cone is marked in one backward pass.
+        '''
+        n = len(self._steps)
+        self._bindcone(n)
+        cone = bytearray(n); cone[n-1] = 1
+        for k in range(n, 0, -1):
+            if cone[k-1]:
+                for r in self._steps[k-1].refs:  cone[r-1] = 1
+        return [ k for k in range(1, n + 1) if cone[k-1] ]
+
+    def prefilter(self, samples:int=64, rng:Optional[Random]=None) -> bool:
+        return self._prefilter(self._cone(), samples, rng)
+
+    def compact(self) -> Proof:
+        self._bindall()
+        return super().compact()
+
+    def _rebuild(self, rep:array) -> Proof:
+        self._bindcone(len(self._steps))
+        return super()._rebuild(rep)
+
+def _unpickle(nschema:int, ngivens:int, flat:tuple, steps:tuple,
+              cls:type=Proof, lemmas:tuple=()) -> Proof:
+    ' Unpickle a `Proof`; see `Proof.__reduce__()`. @private '
+    fms = unflatten(*flat)
+    def step(st:tuple) -> Step:
+        if st[0] is Lemma:
+            _, index, subs = st
+            return Lemma(index,
+                None if subs is None else [ fms[i] for i in subs ])
+        if st[0] is not Axiom:  return st[0](*st[1])
+        _, index, subs, asserted = st
+        return Axiom(index,
+            None if subs is None else [ fms[i] for i in subs ],
+            None if asserted is None else fms[asserted])
+    return cls(map(Schema, fms[:nschema]), fms[nschema:nschema+ngivens],
+               ((n, step(st)) for n, st in enumerate(steps, 1)), lemmas)
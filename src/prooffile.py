@@ -0,0 +1,357 @@
+''' A line-oriented text format for proofs, and a streaming checker that
+    validates a proof in this format as it's read, without building a
+    `Proof` object.
+
+    A proof file is a sequence of lines, each of which is one of:
+
+    - blank, or a comment starting with ``#``; these are ignored;
+    - ``given F``, adding formula ``F`` to the list of givens (the first
+      is ``Given 1``, the second ``Given 2``, and so on);
+    - ``N Given I``: step ``N`` uses given ``I``;
+    - ``N Axiom I S₁ S₂ …``: step ``N`` instantiates axiom schema ``I`` with
+      the substitutions ``Sₙ`` (if none are given, the step asserts the
+      schema itself);
+    - ``N Axiom I [S₁ …] = F``: as above, but asserting formula ``F``, which
+      must be an instance of schema ``I`` (see `proof.Axiom`);
+    - ``N MP MIN MAJ``: step ``N`` is modus ponens from steps ``MIN``
+      and ``MAJ``;
+    - ``N Lemma I S₁ S₂ …``: step ``N`` instantiates the assertion of
+      lemma ``I`` with the substitutions ``Sₙ`` (see `proof.Lemma`);
+    - ``lemma``, starting the proof of a lemma, which consists of the
+      step lines up to a line ``end``. The first lemma in the file is
+      ``Lemma 1``, the second ``Lemma 2``, and so on. A lemma can have no
+      givens, and can use only the lemmas before it.
+
+    Formulae are written in Polish notation without spaces (see
+    `Fm.pn()` and `parse.parsepn()`), and step numbers must count up from
+    1 (in each lemma, and in the proof itself). For example::
+
+        lemma
+        1 Axiom 1 φ ψ
+        end
+        given  →PQ
+        1 Lemma 1 P Q
+        2 Given 1
+        3 Axiom 1 = →Q→PQ
+
+    A lemma is checked once, where it's defined, however many steps use
+    it, so writing a sub-derivation that's repeated many times in a proof
+    as a lemma makes the file smaller and faster to check.
+
+    `lines()` generates this format from a `Proof`, and `check()` checks
+    a proof in this format, reading one step at a time, checking it, and
+    stopping at the first invalid step.
+
+    While `check()` is running it holds only the givens and the formulae
+    of steps that will be referenced by a later step. Knowing which steps
+    these are requires the *last-use index* (see `lastuse()`) produced by
+    an earlier pass over the file, so checking a file with `checkfile()`
+    reads it twice. Without a last-use index `check()` must keep every
+    step's formula, as with a `Proof`.
+'''
+
+from    formula  import *
+from    parse  import parsepn
+from    proof  import AXIOMS, Axiom, Given, Lemma, MP, Proof, Step
+from    schema  import Schema
+
+from    array  import array
+from    typing  import Iterable, Iterator, NamedTuple, Optional, Sequence
+
+class FormatError(ValueError):
+    ''' A line of a proof file could not be parsed. `lineno` is the
+        (1-based) line number of the line.
+    '''
+    def __init__(self, msg:str, lineno:int):
+        super().__init__(f'line {lineno}: {msg}')
+        self.lineno = lineno
+
+class Result(NamedTuple):
+    ' The result of `check()`ing a proof. '
+    valid:bool
+    ' `True` if every step of the proof is valid. '
+    steps:int
+    ' The number of steps read, including the first invalid step (if any). '
+    bad:Optional[int] = None
+    ' The number of the first invalid step, or `None` if the proof is valid. '
+    error:str = ''
+    ' A description of why step `bad` is invalid. '
+    assertion:Optional[Fm] = None
+    ' The formula asserted by the final step, if the proof is valid. '
+    lemma:Optional[int] = None
+    ''' The number of the lemma containing step `bad`, or `None` if it's
+        a step of the proof itself. `steps` then counts the steps of the
+        lemma.
+    '''
+
+def lines(proof:Proof) -> Iterator[str]:
+    ''' Generate the lines (without newlines) of `proof` in proof file
+        format. The lemmas it uses, and those they use, and so on, are
+        written first, each once, in an order in which every lemma comes
+        after those it uses.
+    '''
+    lemmas = _lemmas(proof)
+    num = { id(lm): i for i, lm in enumerate(lemmas, 1) }
+    for lm in lemmas:
+        yield 'lemma'
+        yield from _steplines(lm, num)
+        yield 'end'
+    for g in proof._givens:
+        yield 'given ' + g.pn()
+    yield from _steplines(proof, num)
+
+def _lemmas(proof:Proof) -> list[Proof]:
+    ' All the lemmas `proof` depends on, each after those it uses. '
+    out:list[Proof] = []; done = { id(proof) }
+    stack = [(proof, iter(proof._lemmas))]
+    while stack:
+        pr, it = stack[-1]
+        for lm in it:
+            if id(lm) not in done:
+                done.add(id(lm))
+                stack.append((lm, iter(lm._lemmas)));  break
+        else:
+            stack.pop()
+            if pr is not proof:  out.append(pr)
+    return out
+
+def _steplines(proof:Proof, num:dict[int, int]) -> Iterator[str]:
+    ''' Generate the step lines of `proof`, where ``num[id(lemma)]`` is the
+        number in the file of each of its lemmas.
+    '''
+    for n, s in proof.steps:
+        if isinstance(s, Given):
+            yield f'{n} Given {s.index}'
+        elif isinstance(s, Axiom):
+            subs = s._substitutions or ()
+            out = [ str(n), 'Axiom', str(s.index), *(f.pn() for f in subs) ]
+            if s._asserted is not None:
+                out += [ '=', s._asserted.pn() ]
+            yield ' '.join(out)
+        elif isinstance(s, MP):
+            yield f'{n} MP {s.min} {s.maj}'
+        elif isinstance(s, Lemma):
+            subs = s._substitutions or ()
+            out = [ str(n), 'Lemma', str(num[id(proof.lemma(s.index))]),
+                    *(f.pn() for f in subs) ]
+            yield ' '.join(out)
+        else:
+            raise Proof.InternalError()
+
+def _split(line:str) -> list[str]:
+    ' The words of `line`, or an empty list if it has no content. '
+    if line.lstrip().startswith('#'):  return []
+    return line.split()
+
+def _stepnum(words:Sequence[str], expected:int, lineno:int) -> int:
+    ' Return the step number from the start of a step line. '
+    try:
+        n = int(words[0])
+    except ValueError:
+        raise FormatError(f'bad step number {words[0]!r}', lineno) from None
+    if n != expected:
+        raise FormatError(f'expected step {expected} but got {n}', lineno)
+    return n
+
+def lastuse(text:Iterable[str]) -> array:
+    ''' Return the *last-use index* for the proof in `text`, an iterable of
+        the lines of a proof file. For each step ``n``, ``lastuse[n]`` is
+        the number of the last step that references it, or 0 if no step
+        does. (``lastuse[0]`` is unused.)
+
+        This reads only the step numbers of the ``MP`` lines, so it's
+        much faster than checking the proof. Lemmas are skipped; `check()`
+        keeps all their steps' formulae while checking them.
+    '''
+    lu = array('L', [0])
+    inlemma = False
+    for lineno, line in enumerate(text, 1):
+        words = _split(line)
+        if words == ['lemma'] or words == ['end']:
+            inlemma = words == ['lemma'];  continue
+        if inlemma or not words or words[0] == 'given':  continue
+        n = _stepnum(words, len(lu), lineno)
+        lu.append(0)
+        if len(words) == 4 and words[1] == 'MP':
+            for w in words[2:]:
+                try:  r = int(w)
+                except ValueError:  continue    # check() will report it
+                if 0 < r < n:  lu[r] = n
+    return lu
+
+class _Window:
+    ''' The part of a proof that `check()` still needs: the givens and the
+        steps that will be referenced again. This provides the parts of
+        the `Proof` interface that `Step` uses to derive and check itself.
+        @private
+    '''
+    def __init__(self, axiom_schema:Sequence[Schema],
+                 lemmas:list[tuple[Result, Schema]]):
+        self._axiom_schema = axiom_schema
+        self._lemmas = lemmas           # shared with the lemmas' windows
+        self._givens:list[Fm] = []
+        self._steps:dict[int, Step] = {}
+        self._fms:dict[int, Fm] = {}
+
+    def axiom_schema(self, n:int) -> Schema:  return self._axiom_schema[n-1]
+    def given(self, n:int) -> Fm:             return self._givens[n-1]
+    def lemma(self, n:int) -> Result:         return self._lemmas[n-1][0]
+    def _lemmaschema(self, n:int) -> Schema:  return self._lemmas[n-1][1]
+    def step(self, n:int) -> Step:            return self._steps[n]
+    def _fm(self, n:int) -> Fm:               return self._fms[n]
+
+def _readstep(words:list[str], n:int, win:_Window, lineno:int) -> Step:
+    ' Parse the step in `words`, check its references and return it. '
+    kind, args = words[1], words[2:]
+    try:
+        if kind == 'Given' and len(args) == 1:
+            g = Given(int(args[0]))
+            if not 0 < g.index <= len(win._givens):
+                raise Proof.StepError(f'Step {n} {g}'
+                    f' references non-existent Given index {g.index}')
+            s:Step = g
+        elif kind == 'Axiom' and args:
+            fm = None
+            if len(args) > 2 and args[-2] == '=':
+                fm = parsepn(args[-1]); args = args[:-2]
+            subs = [ parsepn(a) for a in args[1:] ] or None
+            a = Axiom(int(args[0]), subs, fm)
+            if not 0 < a.index <= len(win._axiom_schema):
+                raise Proof.StepError(f'Step {n} {a}'
+                    f' references non-existent axiom Schema index {a.index}')
+            s = a
+        elif kind == 'MP' and len(args) == 2:
+            s = MP(int(args[0]), int(args[1]))
+            if not (0 < s.min < n and 0 < s.maj < n):
+                raise Proof.StepError(
+                    f'Step {n} {s} references non-existent previous steps')
+            if s.min not in win._fms or s.maj not in win._fms:
+                raise Proof.StepError(f'Step {n} {s}'
+                    ' references a step past its last use')
+        elif kind == 'Lemma' and args:
+            lm = Lemma(int(args[0]), [ parsepn(a) for a in args[1:] ] or None)
+            if not 0 < lm.index <= len(win._lemmas):
+                raise Proof.StepError(f'Step {n} {lm}'
+                    f' references non-existent lemma index {lm.index}')
+            s = lm
+        else:
+            raise FormatError(f'bad step {" ".join(words[1:])!r}', lineno)
+    except ValueError as ex:
+        if isinstance(ex, (FormatError, Proof.StepError)):  raise
+        raise FormatError(str(ex), lineno) from None
+    s._proof = win      # type: ignore [assignment]
+    s._step = n
+    return s
+
+def check(text:Iterable[str], axiom_schema:Sequence[Schema]=AXIOMS['PS'],
+          lastuse:Optional[Sequence[int]]=None) -> Result:
+    ''' Check the proof in `text`, an iterable of the lines of a proof file,
+        using the given axiom schema, returning a `Result`.
+
+        Lines are read only up to the first invalid step. Malformed lines
+        raise a `FormatError` and references to steps, givens or schema
+        that don't exist raise a `Proof.StepError`, as with `Proof`.
+
+        If `lastuse` (see `lastuse()`) is given, each step's formula is
+        discarded as soon as the last step referencing it has been
+        checked, so the memory used depends on the number of steps "in
+        flight" at any point rather than the length of the proof.
+
+        Each lemma is checked where it's defined, and if it is invalid
+        checking stops there, with `Result.lemma` giving its number.
+    '''
+    return _check(enumerate(text, 1), _Window(axiom_schema, []), lastuse)
+
+def _check(numbered:Iterator[tuple[int, str]], win:_Window,
+           lastuse:Optional[Sequence[int]], lemmaline:int=0) -> Result:
+    ''' Check the proof (or, if `lemmaline` is the number of its ``lemma``
+        line, the lemma) in the remaining lines of `numbered`.
+    '''
+    n = 0; fm:Optional[Fm] = None
+    for lineno, line in numbered:
+        words = _split(line)
+        if not words:  continue
+        if words[0] == 'given':
+            if lemmaline:
+                raise FormatError('a lemma may not have givens', lineno)
+            if len(words) != 2:
+                raise FormatError('expected one formula', lineno)
+            try:  win._givens.append(parsepn(words[1]))
+            except ValueError as ex:  raise FormatError(str(ex), lineno)
+            continue
+        if words == ['lemma']:
+            if lemmaline:
+                raise FormatError('lemmas may not be nested', lineno)
+            lr = _check(numbered, _Window(win._axiom_schema, win._lemmas),
+                        None, lineno)
+            if not lr.valid:
+                return lr._replace(lemma=len(win._lemmas) + 1)
+            sc = Schema(lr.assertion)               # type: ignore [arg-type]
+            win._lemmas.append((lr, sc))
+            continue
+        if words == ['end']:
+            if not lemmaline:
+                raise FormatError('end without lemma', lineno)
+            if n == 0:
+                raise FormatError('lemma has no steps', lemmaline)
+            return Result(True, n, assertion=fm)
+
+        n = _stepnum(words, n + 1, lineno)
+        if len(words) < 3:
+            raise FormatError('expected step', lineno)
+        s = _readstep(words, n, win, lineno)
+        try:
+            fm = s._derive()
+            ok = s._check()
+        except MP.MPError as ex:
+            return Result(False, n, n, str(ex))
+        except ValueError as ex:        # wrong number of substitutions
+            raise FormatError(str(ex), lineno) from None
+        if not ok:
+            return Result(False, n, n, _why(s, fm))
+
+        if lastuse is None or (n < len(lastuse) and lastuse[n]):
+            win._steps[n] = s; win._fms[n] = fm
+        if lastuse is not None:
+            for r in s.refs:
+                if lastuse[r] == n:
+                    win._steps.pop(r, None); win._fms.pop(r, None)
+
+    if lemmaline:
+        raise FormatError('lemma has no end', lemmaline)
+    if n == 0:
+        raise ValueError('steps may not be empty')
+    return Result(True, n, assertion=fm)
+
+def _why(s:Step, fm:Fm) -> str:
+    ' Describe why `s`, generating `fm`, is invalid. '
+    if isinstance(s, MP):
+        return f'minor premise {s.minfm} is not {s.antecedent}'
+    elif isinstance(s, Axiom):
+        return f'{fm} is not an instance of axiom schema {s.index}'
+    elif isinstance(s, Lemma):
+        return f'lemma {s.index} is not valid'
+    else:
+        raise Proof.InternalError()
+
+def checkproof(proof:Proof) -> Result:
+    ''' Check `proof` step by step, as `check()` does for a proof file,
+        returning a `Result` for the first invalid step.
+    '''
+    n = 0
+    for n, s in proof.steps:
+        try:
+            if not s.valid:
+                return Result(False, n, n, _why(s, s.fm))
+        except MP.MPError as ex:
+            return Result(False, n, n, str(ex))
+    return Result(True, n, assertion=proof.assertion)
+
+def checkfile(path:str, axiom_schema:Sequence[Schema]=AXIOMS['PS']) -> Result:
+    ''' Check the proof in file `path` with `check()`, first reading the
+        file to build its `lastuse()` index.
+    '''
+    with open(path, encoding='UTF-8') as f:
+        lu = lastuse(f)
+    with open(path, encoding='UTF-8') as f:
+        return check(f, axiom_schema, lu)
@@ -5,6 +5,10 @@
 
     A list of `Schema` are usually used as the "axioms" (actually, *axiom
     schema*) in a logic system.
+
+    The reverse of substitution is *matching:* `Schema.match()` finds the
+    substitutions, if any, that would produce a given formula. `unify()`
+    finds the most general substitutions that make two formulae equal.
 '''
 
 from    formula  import *
@@ -18,6 +22,10 @@ class Schema:
     def __str__(self) -> str:
         return str(self.fm)
 
+    def __reduce__(self):
+        ' Pickle just the formula, not the cached instantiation plan, etc. '
+        return (Schema, (self._fm,))
+
     @property
     def fm(self) -> Fm:
         ' The formula for this schema. '
@@ -37,28 +45,172 @@ class Schema:
             index in `subs`. If `subs` is not given or is `None`, the
             metavariables will be substituted with variables of the same
             name.
+
+            This runs the instantiation plan (see `_plan`) compiled for this
+            schema the first time it's used. Formulae are interned, so the
+            substituted formulae are shared by the result, not copied.
         '''
-        if subs is None:  subs = tuple(map(Fm, self.metavars))
+        if subs is None:  return self.fm
         if len(subs) != len(self.metavars):
             raise ValueError(f'substitution list ({", ".join(map(str, subs))})'
                 f' does not match metavariable list {repr(self.metavars)}')
-        def _sub(f):
-            if f is None:  return None
-            if f.type is not Fm.VAR:
-                return Fm(f.value, _sub(f.left), _sub(f.right))
+        r:list[Optional[Fm]] = [None, *subs]
+        mk = Fm._mk
+        for value, ty, li, ri in self._plan:
+            r.append(mk(value, ty, r[li], r[ri]))
+        return r[-1]                    # type: ignore [return-value]
+
+    @lazyproperty
+    def _plan(self) -> tuple[tuple[str, Fm.NodeType, int, int], ...]:
+        ''' The instantiation plan for this schema, used by `sub()`.
+
+            The plan operates on a list of "registers." Register 0 always
+            holds `None` (the missing left child of a monadic node) and
+            registers 1 through *n* hold the formulae substituted for the
+            *n* metavariables. Each instruction ``(value, type, l, r)`` in
+            the plan appends to the list a new register holding the node
+            with that value and type and the children in registers *l*
+            and *r*. The last register holds the result.
+
+            There is one instruction for each distinct connective node in
+            the schema, in post-order (every node following its children).
+            This is compiled using an explicit stack rather than recursion
+            so that it works on formulae of any depth. Since the schema's
+            own nodes are known to be valid, the nodes produced by the plan
+            need not be validated.
+        '''
+        reg = { id(None): 0 }
+        for i, mv in enumerate(self.metavars, 1):  reg[id(Fm(mv))] = i
+        plan = []
+        stack = [self.fm]
+        while stack:
+            f = stack.pop()
+            if id(f) in reg:  continue
+            l = f._left; r = f._right
+            if id(l) in reg and id(r) in reg:
+                plan.append((f._value, f._type, reg[id(l)], reg[id(r)]))
+                reg[id(f)] = len(self.metavars) + len(plan)
             else:
-                f = subs[self.metavars.index(f.value)]
-                return Fm(f.value, f.left, f.right)
-        return _sub(self.fm)
+                stack.append(f); stack.append(r); stack.append(l)  # type: ignore [arg-type]
+        return tuple(plan)
 
-    def subm(self, **subdict:dict[str,Fm]) -> Fm:
+    def subm(self, **subdict:Fm) -> Fm:
         ''' Given a `dict` mapping metavariable names to formulae, return a
             new formula `Fm` with all metavariables in this schema
             substituted with their corresponding formulae in the mapping.
             Missing metavariable names will be substituted with variables
-            of the same name.
+            of the same name. Names that are not metavariables of this
+            schema are ignored, so that the same mapping (e.g., from
+            `unify()`) can be applied to several schemas.
+        '''
+        return self.sub([ subdict.get(mv) or Fm(mv) for mv in self.metavars ])
+
+    def match(self, fm:Fm) -> Optional[tuple[Fm, ...]]:
+        ''' Return the substitutions that instantiate this schema as `fm`,
+            in the same form as the `subs` argument to `sub()`, or `None`
+            if `fm` is not an instance of this schema.
+
+            This is one-way matching: the variables of `fm` are treated as
+            constants. The search stops at the first mismatched connective
+            or inconsistent substitution, and each pairing of schema and
+            formula node is checked only once, so shared subformulae cost
+            nothing extra.
+        '''
+        binding:dict[str, Fm] = {}
+        seen = set()
+        stack = [(self.fm, fm)]
+        while stack:
+            p, f = stack.pop()
+            if p._type is Fm.VAR:
+                if binding.setdefault(p._value, f) is not f:  return None
+            elif p._value != f._value:
+                return None
+            elif (id(p), id(f)) not in seen:
+                seen.add((id(p), id(f)))
+                stack.append((p._right, f._right))          # type: ignore [arg-type]
+                if p._left is not None:
+                    stack.append((p._left, f._left))        # type: ignore [arg-type]
+        return tuple(binding[mv] for mv in self.metavars)
 
-            XXX (This is not currently implemented. We need to consider
-            what error checking needs to be done with this.)
+    def unify(self, other:"Schema") -> Optional[dict[str, Fm]]:
+        ''' Return the most general unifier of this schema and `other`
+            (see `unify()`), or `None` if they cannot be unified.
         '''
-        raise NotImplementedError()
+        return unify(self.fm, other.fm)
+
+def unify(f:Fm, g:Fm) -> Optional[dict[str, Fm]]:
+    ''' Return the most general unifier of formulae `f` and `g`, or `None`
+        if there is none. The unifier is a `dict` mapping variable names to
+        formulae such that substituting them throughout (e.g., with
+        `Schema.subm()`) makes `f` and `g` identical.
+
+        >>> mgu = unify(Im(φ, Im(ψ, φ)), Im(Im(A, B), χ))
+        >>> sorted((v, str(f)) for v, f in mgu.items())
+        [('φ', 'A → B'), ('χ', 'ψ → (A → B)')]
+
+        All variables in both formulae are treated as metavariables in a
+        single namespace; if you want the variables in the two to be
+        distinct, rename them apart first. This uses an explicit work list
+        rather than recursion, stops at the first mismatched connective,
+        and does an occurs check (so, e.g., ``φ`` and ``¬φ`` do not unify).
+
+        As with `Schema.match()`, each pairing of nodes is unified only
+        once, so shared subformulae cost nothing extra. The occurs check
+        uses the variables of each formula (`Fm.vars`, which is cached on
+        the node), following bindings variable by variable, so it never
+        re-walks a formula.
+    '''
+    bound:dict[str, Fm] = {}        # triangular: values may contain bound vars
+
+    def walk(x:Fm) -> Fm:
+        while x._type is Fm.VAR and x._value in bound:  x = bound[x._value]
+        return x
+
+    def occurs(v:str, x:Fm) -> bool:
+        seen = set(); stack = [x]
+        while stack:
+            for u in stack.pop().vars:
+                if u == v:  return True
+                if u in bound and u not in seen:
+                    seen.add(u);  stack.append(bound[u])
+        return False
+
+    seen = set()
+    stack = [(f, g)]
+    while stack:
+        a, b = stack.pop()
+        a = walk(a); b = walk(b)
+        if a is b or (id(a), id(b)) in seen:  continue
+        seen.add((id(a), id(b)))
+        if b._type is Fm.VAR:  a, b = b, a
+        if a._type is Fm.VAR:
+            if occurs(a._value, b):  return None
+            bound[a._value] = b
+        elif a._value != b._value:
+            return None
+        else:
+            stack.append((a._right, b._right))              # type: ignore [arg-type]
+            if a._left is not None:  stack.append((a._left, b._left))  # type: ignore [arg-type]
+
+    #   Resolve the bindings so that no value contains a bound variable.
+    done:dict[int, Optional[Fm]] = { id(None): None }
+    for v in bound:
+        stack2 = [bound[v]]
+        while stack2:
+            x = stack2[-1]
+            if id(x) in done:
+                stack2.pop()
+            elif x._type is Fm.VAR:
+                if x._value not in bound:
+                    done[id(x)] = x; stack2.pop()
+                elif id(bound[x._value]) in done:
+                    done[id(x)] = done[id(bound[x._value])]; stack2.pop()
+                else:
+                    stack2.append(bound[x._value])
+            elif id(x._left) in done and id(x._right) in done:
+                done[id(x)] = Fm._mk(x._value, x._type,
+                    done[id(x._left)], done[id(x._right)])
+                stack2.pop()
+            else:
+                stack2.append(x._right); stack2.append(x._left) # type: ignore [arg-type]
+    return { v: done[id(x)] for v, x in bound.items() }     # type: ignore [misc]
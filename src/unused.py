@@ -11,7 +11,8 @@
     instantiations of axiom schema, which is not too tough, but nothing to
     do with graphs. (It gets tougher if you have to deal with error
     checking, such as substitutions for variable indices that are not in
-    the axiom schema.)
+    the axiom schema.) `proof.Proof.compact()` does this, and more
+    generally merges any steps generating the same formula, for `Proof`s.
 
     The full problem would be remvoal of *all* redundancy, which is
     a lot more difficult, since I believe it's possible to have
@@ -20,8 +21,9 @@
     with an example, so I may be wrong.
 '''
 
+from    array  import array
 from    enum  import Enum
-from    typing  import List, Set
+from    typing  import List
 
 ####################################################################
 #   Data structures suggested by someone else; I am dubious about these.
@@ -98,28 +100,35 @@ def rmunused(steps: List[ProofStep]) -> List[ProofStep]:
         MPs and their immediate dependencies, returning all those.
 
         This is O(n): the number of operations is a (small) multiple
-        of the number of steps.
+        of the number of steps. Each step is marked as used at most once,
+        in a `bytearray`, using an explicit worklist rather than recursion,
+        so a step shared by many others is traced only once and long chains
+        of MPs do not overflow the stack.
     '''
     stepcount = len(steps)
     if stepcount == 0:      return []           # Empty proof: no redundancy.
-    if steps[-1].notMP:     return steps[-1:]   # If last step is not an MP,
-                                                #   no previous steps needed.
-
-    #   Last step is MP; trace it back, finding every dependency.
-    def trace(i: int) -> Set[int]:
-        s = steps[i]
-        if s.notMP:  return set([i])
-        return set([i]).union(trace(s.min)).union(trace(s.maj))
-    depset = trace(stepcount-1)
-    newidx = dict(zip(
-        sorted(depset),
-        range(0, len(depset))))
-
-    #   Build the new list of steps, updating MP step "pointers."
-    def updateMP(step: ProofStep) -> ProofStep:
-        if step.notMP:  return step
-        return MP(newidx[step.min], newidx[step.maj])
-    newsteps = []
-    for i in newidx:
-        newsteps.append(updateMP(steps[i]))
+
+    #   Trace back from the last step, marking every dependency.
+    used = bytearray(stepcount)
+    used[-1] = 1
+    work = [stepcount-1]
+    while work:
+        s = steps[work.pop()]
+        if s.notMP:  continue
+        for i in (s.min, s.maj):
+            if not used[i]:
+                used[i] = 1
+                work.append(i)
+
+    #   Build the new list of steps, updating MP step "pointers." As steps
+    #   reference only earlier steps, the new index of every step an MP
+    #   references has already been set when we reach that MP.
+    newidx = array('L', [0]) * stepcount
+    newsteps:List[ProofStep] = []
+    for i, step in enumerate(steps):
+        if not used[i]:  continue
+        newidx[i] = len(newsteps)
+        if not step.notMP:
+            step = MP(newidx[step.min], newidx[step.maj])
+        newsteps.append(step)
     return newsteps
@@ -0,0 +1,230 @@
+''' A benchmark suite for the hot paths of the proof checker, run on
+    synthetic formulae and proofs: deep implication chains, wide balanced
+    trees, long PS derivations of ``φ → φ`` lemmas and many-step `MP`
+    chains.
+
+    Run from the top level of the repo with ``python tool/bench.py``. The
+    time of each benchmark is printed and, with ``-o FILE``, written as
+    JSON. With ``-b FILE`` the times are compared with those in a JSON
+    file from an earlier run (``tool/bench_baseline.json`` is one from the
+    machine noted in it), and any more than ``--threshold`` slower are
+    flagged as regressions, making the exit status 1.
+
+    Times from different machines, or from different versions of Python,
+    can't usefully be compared, and even on one machine they drift with
+    its load and configuration, so the baseline must be refreshed: to
+    check a change make your own baseline just before it, and when a
+    change that alters the times is accepted regenerate
+    ``tool/bench_baseline.json`` (``python tool/bench.py -o
+    tool/bench_baseline.json``) in the same commit. Run with ``--help``
+    for all options.
+
+    Each benchmark has a *setup* that builds its data, which is not timed,
+    and a *run* that is timed, repeated ``--repeat`` times, each with
+    fresh data. Caches are defeated by building fresh data or, for
+    `lazyproperty` and `lrumethod` attributes, calling the underlying
+    function directly. The time reported is the median of the repeats,
+    and its *noise* is their median absolute deviation from it, as a
+    fraction of it. A benchmark is a regression only if its median is
+    slower than the baseline's by more than ``--threshold`` and by more
+    than three times the sum of the noise of the two runs, so that
+    benchmarks that vary a lot from run to run are not flagged by chance.
+'''
+
+import  os, sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from    formula  import *
+from    proof  import AXIOMS, Axiom, Given, LazyProof, MP, Proof
+from    schema  import Schema
+from    time  import perf_counter
+from    typing  import Any, Callable, Union
+import  argparse, fnmatch, json, platform, statistics
+import  unused
+
+PS = AXIOMS['PS']
+
+####################################################################
+#   Synthetic data
+
+def chain(n:int, f:Fm=φ) -> Fm:
+    ' A right-nested chain of `n` implications ``ψ → (ψ → … f)``. '
+    for _ in range(n):  f = Im(ψ, f)
+    return f
+
+def balanced(depth:int) -> Fm:
+    ''' A balanced tree of implications of the given depth, with leaves
+        that vary so that few subtrees are shared.
+    '''
+    vs = [ Fm(v) for v in 'ABCDEFGHIJKLMNOPQRSTUVWXYZ' ]
+    level = []
+    for i in range(1 << depth):
+        f = Im(vs[i % 26], vs[i // 26 % 26])
+        level.append(No(f) if i // 676 % 2 else f)
+    while len(level) > 1:
+        level = [ Im(level[i], level[i+1]) for i in range(0, len(level), 2) ]
+    return level[0]
+
+def idsteps(first:int, f:Fm) -> list[tuple[int, Union[Axiom, MP]]]:
+    ''' The five steps of the derivation of ``f → f`` in PS, numbered from
+        `first`.
+    '''
+    n = first
+    return [ (n,   Axiom(1, [f, f])),
+             (n+1, Axiom(1, [f, Im(f, f)])),
+             (n+2, Axiom(2, [f, Im(f, f), f])),
+             (n+3, MP(n+1, n+2)),
+             (n+4, MP(n, n+3)) ]
+
+def lemmas(n:int, f:Fm) -> list:
+    ''' The steps of `n` derivations of ``g → g`` for ``g`` each of the
+        formulae ``f``, ``¬f``, ``¬¬f``, …; only the last is used by the
+        final step.
+    '''
+    steps = []
+    for _ in range(n):
+        steps += idsteps(len(steps) + 1, f)
+        f = No(f)
+    return steps
+
+def mpchain(n:int) -> tuple[list[Fm], list]:
+    ''' Givens ``P``, ``P → ¬P``, ``¬P → ¬¬P``, … and the `n` `MP` steps
+        (with a `Given` step for each) that derive ``¬ⁿP`` from them.
+    '''
+    fs = [P]
+    for _ in range(n):  fs.append(No(fs[-1]))
+    givens = [P] + [ Im(fs[i], fs[i+1]) for i in range(n) ]
+    steps:list = [(1, Given(1))]
+    for i in range(n):
+        k = len(steps)
+        steps += [ (k+1, Given(i+2)), (k+2, MP(k, k+1)) ]
+    return givens, steps
+
+####################################################################
+#   Benchmarks
+
+BENCHMARKS:dict[str, tuple[Callable[[], Any], Callable[[Any], Any]]] = {}
+''' Each benchmark's name and its *setup*, which returns the data, and
+    its *run*, which is timed.
+'''
+
+def bench(name:str, setup:Callable[[], Any]=lambda: None):
+    def register(run:Callable[[Any], Any]):
+        BENCHMARKS[name] = (setup, run);  return run
+    return register
+
+STR = Fm.__str__.f                  # type: ignore [attr-defined]
+VARS = Fm.__dict__['vars'].f
+
+DEEP = 10_000;  WIDE = 14
+
+bench('Fm construction, deep chain')(lambda _: chain(DEEP))
+bench('Fm construction, balanced tree')(lambda _: balanced(WIDE))
+
+@bench('Fm.__eq__, 100k', lambda: [ (φ, φ), (φ, ψ), (Im(φ, ψ), Im(φ, ψ)) ])
+def _(pairs):
+    for _ in range(100_000 // len(pairs)):
+        for a, b in pairs:  a == b
+
+bench('Fm.__str__, deep chain', lambda: chain(DEEP))(STR)
+bench('Fm.__str__, balanced tree', lambda: balanced(WIDE))(STR)
+bench('Fm.vars, deep chain', lambda: chain(DEEP))(VARS)
+bench('Fm.vars, balanced tree', lambda: balanced(WIDE))(VARS)
+
+@bench('Schema.sub, axiom 2 on balanced trees',
+       lambda: (Schema(PS[1].fm), [ balanced(8), chain(100), balanced(9) ]))
+def _(x):
+    sc, subs = x
+    for _ in range(1000):  sc.sub(subs)
+
+bench('Proof construction, 1000 lemmas',
+      lambda: lemmas(1000, chain(10)))(lambda steps: Proof(PS, [], steps))
+bench('Proof construction, MP chain 10k',
+      lambda: mpchain(10_000))(lambda x: Proof(PS, *x))
+bench('Proof.valid, 1000 lemmas',
+      lambda: Proof(PS, [], lemmas(1000, chain(10))))(lambda pr: pr.valid)
+bench('Proof.valid, MP chain 10k',
+      lambda: Proof(PS, *mpchain(10_000)))(lambda pr: pr.valid)
+bench('LazyProof construction and valid, 1000 lemmas',
+      lambda: lemmas(1000, chain(10)))(lambda steps: LazyProof(PS, [], steps).valid)
+bench('Proof.rmunused, 1000 lemmas',
+      lambda: Proof(PS, [], lemmas(1000, chain(10))))(lambda pr: pr.rmunused())
+
+def unusedsteps(n:int) -> list[unused.ProofStep]:
+    ' `n` `unused.ProofStep`s, every other one unused. '
+    steps = [ unused.A1, unused.A2 ]
+    while len(steps) < n:
+        steps += [ unused.MP(len(steps) - 2, 0), unused.A2 ]
+    return steps[:-1]
+
+bench('unused.rmunused, 100k steps',
+      lambda: unusedsteps(100_000))(unused.rmunused)
+
+####################################################################
+#   Running
+
+def run(name:str, repeat:int) -> tuple[float, float]:
+    ''' Return the median time of `repeat` runs of benchmark `name` and
+        its noise, the median absolute deviation as a fraction of it.
+    '''
+    setup, f = BENCHMARKS[name]
+    times = []
+    for _ in range(repeat):
+        data = setup()
+        start = perf_counter()
+        f(data)
+        times.append(perf_counter() - start)
+        del data
+    t = statistics.median(times)
+    return t, statistics.median( abs(x - t) for x in times ) / t
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description='Run the benchmark suite.')
+    p.add_argument('-o', '--output', help='write the results as JSON here')
+    p.add_argument('-b', '--baseline', help='compare with results in this file')
+    p.add_argument('-t', '--threshold', type=float, default=0.10,
+        help='fraction slower than the baseline that is a regression'
+             ' (default: %(default)s)')
+    p.add_argument('-r', '--repeat', type=int, default=15,
+        help='runs of each benchmark (default: %(default)s)')
+    p.add_argument('-k', '--select', default='*',
+        help='run only benchmarks whose names match this glob')
+    p.add_argument('-l', '--list', action='store_true',
+        help='list the benchmarks and exit')
+    args = p.parse_args(argv)
+
+    names = [ n for n in BENCHMARKS if fnmatch.fnmatch(n, args.select) ]
+    if args.list:
+        print('\n'.join(names));  return 0
+    base:dict = {}; basenoise:dict = {}
+    if args.baseline:
+        with open(args.baseline) as f:  j = json.load(f)
+        base = j['results'];  basenoise = j.get('noise', {})
+
+    results = {}; noise = {}; regressions = 0
+    for name in names:
+        t, e = results[name], noise[name] = run(name, args.repeat)
+        line = f'{t*1e3:10.3f} ms ±{e:4.0%}  {name}'
+        if name in base:
+            ratio = t / base[name]
+            line += f'  ({ratio:5.2f}× baseline)'
+            tolerance = max(args.threshold, 3 * (e + basenoise.get(name, 0)))
+            if ratio > 1 + tolerance:
+                line += '  REGRESSION';  regressions += 1
+        print(line, flush=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({ 'python': platform.python_version(),
+                        'machine': platform.machine(),
+                        'processor': platform.processor(),
+                        'repeat': args.repeat,
+                        'results': results,
+                        'noise': noise }, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+    if regressions:
+        print(f'{regressions} regression(s)')
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+''' Throughput of `batch.checkimage()` and `batch.checkfiles()` with
+    different numbers of workers, compared with checking `Proof` objects
+    in this process, and the size and speed of pickling proofs (as would
+    be needed to send them to workers) flat and as graphs of objects.
+
+    Run from the top level of the repo with ``python tool/bench_batch.py``.
+'''
+
+import  os, sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from    batch  import checkfiles, checkimage
+from    formula  import *
+from    image  import save
+from    proof  import AXIOMS, Axiom, MP, Proof
+from    prooffile  import checkproof, lines
+from    schema  import Schema
+from    tempfile  import TemporaryDirectory
+from    time  import perf_counter
+import  pickle
+
+def proof(i, depth=200):
+    ''' A proof of ``φ → φ`` (the ``idALT`` proof) for a ``φ`` that is
+        a chain of `depth` implications, different for each `i`.
+    '''
+    f = Fm('ABCDEFG'[i % 7])
+    for j in range(depth):  f = Im(Fm('PQRST'[(i + j) % 5]), f)
+    return Proof(AXIOMS['PS'], (), (
+        (1, Axiom(1, [f, f])),
+        (2, Axiom(1, [f, Im(f,f)])),
+        (3, Axiom(2, [f, Im(f,f), f])),
+        (4, MP(2,3)),
+        (5, MP(1,4)),
+    ))
+
+def graph_pickle(prs):
+    ''' Pickle as before, with each proof, step, schema and `Fm` node
+        pickled as an object.
+    '''
+    saved = Fm.__reduce__, Proof.__reduce__, Schema.__reduce__
+    Fm.__reduce__ = lambda self: (Fm, (self._value, self._left, self._right))
+    Proof.__reduce__ = lambda self: \
+        (Proof, (self._axiom_schema, self._givens, self.steps))
+    del Schema.__reduce__
+    try:
+        return pickle.dumps(prs)
+    finally:
+        Fm.__reduce__, Proof.__reduce__, Schema.__reduce__ = saved
+
+def timed(f, n):
+    start = perf_counter(); f(); return (perf_counter() - start) / n
+
+if __name__ == '__main__':
+    n = 2000
+    for name, dumps in (('graph', graph_pickle), ('flat', pickle.dumps)):
+        prs = [ proof(i) for i in range(n) ]
+        size = len(dumps(prs[:1]))
+        td = timed(lambda: [ dumps([p]) for p in prs ], n)
+        s = [ dumps([p]) for p in prs ]
+        tl = timed(lambda: [ pickle.loads(x) for x in s ], n)
+        print(f'{name:5} pickle: {size:5} bytes,'
+              f' dump {td*1e6:5.0f} µs, load {tl*1e6:5.0f} µs')
+
+    prs = [ proof(i) for i in range(n) ]
+    t = timed(lambda: all(checkproof(p).valid for p in prs), n)
+    print(f'checkproof, in process:  {1/t:7.0f} proofs/s')
+
+    with TemporaryDirectory() as d:
+        img = os.path.join(d, 'proofs.img')
+        save(img, prs)
+        for workers in (0, 1, 2, 4):
+            t = timed(lambda: all(r.valid for r in checkimage(img, workers)), n)
+            print(f'checkimage workers={workers}: {1/t:7.0f} proofs/s')
+        paths = []
+        for i in range(n):
+            paths.append(os.path.join(d, str(i)))
+            with open(paths[-1], 'w', encoding='UTF-8') as f:
+                f.write('\n'.join(lines(proof(i))))
+        for workers in (0, 1, 2, 4):
+            t = timed(lambda: all(r.valid for r in checkfiles(paths,
+                                                   workers=workers)), n)
+            print(f'checkfiles workers={workers}: {1/t:7.0f} proofs/s')
+
+''' Results on a single-core machine, so no speedup from more workers is
+    possible; the figures for more than one worker show only the overhead.
+    Scaling with cores has not yet been measured, and should be before
+    relying on it.
+
+    graph pickle:  2475 bytes, dump    87 µs, load   157 µs
+    flat  pickle:  1325 bytes, dump   114 µs, load   106 µs
+    checkproof, in process:   118463 proofs/s
+    checkimage workers=0:    1758 proofs/s
+    checkimage workers=1:    1428 proofs/s
+    checkimage workers=2:    1384 proofs/s
+    checkimage workers=4:    1285 proofs/s
+    checkfiles workers=0:     280 proofs/s
+    checkfiles workers=1:     233 proofs/s
+    checkfiles workers=2:     234 proofs/s
+    checkfiles workers=4:     251 proofs/s
+
+    These proofs take under 10 µs to check once their formulae exist, and
+    over 100 µs to pickle, so sending `Proof` objects built in this
+    process to workers (as the former ``checkall()`` did, at about 3.4k
+    proofs/s with any number of workers) is always slower than checking
+    them here. Workers must instead read the proofs themselves. Decoding
+    a proof from an image (about 0.6 ms here, for these 200-deep
+    formulae, none shared between proofs) or parsing a proof file
+    (about 4 ms) is done entirely by the workers, and sending them work
+    costs about 0.1 ms per chunk of proofs or per file, so both should
+    scale nearly linearly up to many cores.
+'''
@@ -0,0 +1,80 @@
+''' Compare a proof that repeats the five-step derivation of ``f → f``
+    for many formulae ``f`` with the same proof using a `Lemma` for it:
+    the size of its proof file (see `prooffile`) and the time to check
+    it, as a `Proof` and as a file.
+
+    Run from the top level of the repo with ``python tool/bench_lemma.py``.
+'''
+
+import  os, sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from    formula  import *
+from    proof  import AXIOMS, Axiom, Lemma, MP, Proof
+from    prooffile  import check, lines
+from    random  import Random
+from    time  import perf_counter
+
+PS = AXIOMS['PS']
+
+def randfm(rng, depth):
+    if depth == 0 or rng.random() < 0.3:  return Fm(rng.choice('PQRST'))
+    if rng.random() < 0.3:  return No(randfm(rng, depth - 1))
+    return Im(randfm(rng, depth - 1), randfm(rng, depth - 1))
+
+def idsteps(n, f):
+    ' The derivation of ``f → f``, as steps `n` to ``n+4``. '
+    return [ (n,   Axiom(1, [f, f])),
+             (n+1, Axiom(1, [f, Im(f, f)])),
+             (n+2, Axiom(2, [f, Im(f, f), f])),
+             (n+3, MP(n+1, n+2)),
+             (n+4, MP(n, n+3)) ]
+
+def expanded(fs):
+    steps = []
+    for f in fs:  steps += idsteps(len(steps) + 1, f)
+    return Proof(PS, [], steps)
+
+def compressed(fs):
+    lemma = Proof(PS, [], idsteps(1, φ))
+    return Proof(PS, [], [ (i, Lemma(1, [f])) for i, f in enumerate(fs, 1) ],
+                 [lemma])
+
+def best(f, repeat=5):
+    t = float('inf')
+    for _ in range(repeat):
+        start = perf_counter();  f();  t = min(t, perf_counter() - start)
+    return t
+
+if __name__ == '__main__':
+    rng = Random(0)
+    for uses in (10, 100, 1000):
+        fs = [ randfm(rng, 5) for _ in range(uses) ]
+        print(f'{uses} uses:')
+        for name, make in (('expanded', expanded), ('lemma', compressed)):
+            text = list(lines(make(fs)))
+            size = sum( len(l.encode('UTF-8')) + 1 for l in text )
+            tpr = best(lambda: make(fs).valid)
+            tfile = best(lambda: check(text))
+            print(f'  {name:9} {size:>9,} bytes   Proof {tpr*1e3:7.2f} ms'
+                  f'   file {tfile*1e3:7.2f} ms')
+
+''' Results::
+
+    10 uses:
+      expanded      3,329 bytes   Proof    0.10 ms   file    1.36 ms
+      lemma           494 bytes   Proof    0.02 ms   file    0.19 ms
+    100 uses:
+      expanded     24,480 bytes   Proof    1.00 ms   file    9.16 ms
+      lemma         3,145 bytes   Proof    0.09 ms   file    1.09 ms
+    1000 uses:
+      expanded    249,607 bytes   Proof   13.48 ms   file   91.67 ms
+      lemma        31,160 bytes   Proof    0.82 ms   file   11.03 ms
+
+    Each use of the lemma is one step, with one substitution, instead of
+    five steps with seven, so the file is about an eighth of the size
+    and takes about an eighth of the time to check (mostly parsing the
+    formulae). The `Proof` is checked some fifteen times faster, since
+    each `Lemma` step only instantiates the lemma's assertion, where the
+    expanded proof instantiates three axioms and checks two `MP`s.
+'''
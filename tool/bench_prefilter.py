@@ -0,0 +1,95 @@
+''' Compare checking candidate proofs, as might be generated by a proof
+    search, with `Proof.valid` alone and with `Proof.prefilter()` first.
+
+    Run from the top level of the repo with ``python tool/bench_prefilter.py``.
+'''
+
+import  os, sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from    formula  import *
+from    proof  import AXIOMS, Axiom, MP, Proof
+from    random  import Random
+from    time  import perf_counter
+import  gc
+
+PS = AXIOMS['PS']
+
+def randfm(rng, depth):
+    if depth == 0 or rng.random() < 0.3:  return Fm(rng.choice('PQRST'))
+    if rng.random() < 0.3:  return No(randfm(rng, depth - 1))
+    return Im(randfm(rng, depth - 1), randfm(rng, depth - 1))
+
+def candidate(rng, nsteps, depth):
+    ''' A random proof of `nsteps` steps, each an `Axiom` with random
+        substitutions or an `MP` of two random earlier implications.
+    '''
+    steps = []; imps = []
+    for n in range(1, nsteps + 1):
+        if len(imps) < 2 or rng.random() < 0.5:
+            i = rng.randrange(3)
+            s = Axiom(i + 1, [ randfm(rng, depth)
+                               for _ in PS[i].metavars ])
+            imps.append(n)
+        else:
+            s = MP(rng.randrange(1, n), rng.choice(imps))
+        steps.append((n, s))
+    return Proof(PS, (), steps)
+
+def valid(pr):
+    try:  return pr.valid
+    except MP.MPError:  return False
+
+def run(check, seed, count, nsteps, depth):
+    rng = Random(seed)
+    prs = [ candidate(rng, nsteps, depth) for _ in range(count) ]
+    gc.collect()
+    start = perf_counter()
+    nvalid = sum( check(pr) for pr in prs )
+    return perf_counter() - start, nvalid
+
+if __name__ == '__main__':
+    prng = Random(1)
+    for nsteps, depth in ((10, 3), (50, 3), (50, 8)):
+        count = 20_000 // nsteps
+        t0, v0 = run(valid, 0, count, nsteps, depth)
+        t1, v1 = run(lambda pr: pr.prefilter(rng=prng) and valid(pr),
+                     0, count, nsteps, depth)
+        assert v0 == v1
+        print(f'{nsteps:3} steps depth {depth}: {v0:3}/{count} valid;'
+              f' valid {t0/count*1e6:7.1f} µs,'
+              f' prefilter+valid {t1/count*1e6:7.1f} µs')
+
+''' Almost all of these random candidates are invalid. Before `valid`
+    stopped at the first invalid step:
+
+     10 steps depth 3:   8/2000 valid; valid    22.3 µs, prefilter+valid   119.4 µs
+     50 steps depth 3:   0/400 valid; valid   121.9 µs, prefilter+valid   467.4 µs
+     50 steps depth 8:   0/400 valid; valid   317.7 µs, prefilter+valid  1293.5 µs
+
+    After:
+
+     10 steps depth 3:   8/2000 valid; valid    10.8 µs, prefilter+valid   115.3 µs
+     50 steps depth 3:   0/400 valid; valid    12.4 µs, prefilter+valid   503.0 µs
+     50 steps depth 8:   0/400 valid; valid    20.1 µs, prefilter+valid  1170.2 µs
+
+    The prefilter never paid off here: it derived the formulae of all the
+    steps it evaluated, which is most of the cost of `valid`, and then
+    compiled and evaluated them, while each structural check of an `MP`
+    is just an identity comparison of interned formulae. Stopping at the
+    first invalid step, on the other hand, saves deriving the formulae of
+    all the later steps.
+
+    With the prefilter also evaluating step by step and stopping at the
+    first step that isn't a tautology:
+
+     10 steps depth 3:   8/2000 valid; valid     9.3 µs, prefilter+valid    43.1 µs
+     50 steps depth 3:   0/400 valid; valid     8.4 µs, prefilter+valid    40.1 µs
+     50 steps depth 8:   0/400 valid; valid    10.9 µs, prefilter+valid    82.2 µs
+
+    (A collection is now forced before each timing, so that garbage from
+    the previous one isn't collected during it.) The prefilter is now 3–14
+    times faster than before, but still 4–8 times slower than `valid`
+    alone, which also stops early and whose checks are
+    cheaper than evaluating a formula.
+'''
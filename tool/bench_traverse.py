@@ -0,0 +1,101 @@
+''' Compare the iterative `Fm` traversals with the recursive versions
+    they replaced, on formulae of ordinary (human-readable) size.
+
+    Run from the top level of the repo with ``python tool/bench_traverse.py``.
+    The caching done by `lazyproperty` and `lazymethod` is bypassed so
+    that each call does the full traversal.
+'''
+
+import  os, sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from    formula  import *
+from    schema  import Schema
+from    timeit  import timeit
+
+####################################################################
+#   The recursive versions, as they were before the change.
+
+def rvars(self):
+    def _vars(fm, acc):
+        if fm is None:  return acc
+        acc = _vars(fm.left, acc)
+        if (fm._type is fm.VAR) and (fm.value not in acc):  acc += fm.value
+        return _vars(fm.right, acc)
+    return _vars(self, '')
+
+def rrepr(self):
+    left = self.left; right = self.right
+    s = 'Fm(' + repr(self.value)
+    if left:
+        s += ', ' + rrepr(left)
+    if right:
+        s += ', '
+        if not left:  s += 'right='
+        s += rrepr(right)
+    return s + ')'
+
+def rstr(self):
+    if self.type == Fm.VAR:
+        return self.value
+    elif self.type == Fm.MONADIC:
+        if self.right.type == Fm.DYADIC:
+            return self.value + '(' + rstr(self.right) + ')'
+        else:
+            return self.value + rstr(self.right)
+    else:
+        if self.left.type == Fm.DYADIC:
+            s = '(' + rstr(self.left) + ')'
+        else:
+            s = rstr(self.left)
+        s += ' ' + self.value + ' '
+        if self.right.type == Fm.DYADIC:
+            s += '(' + rstr(self.right) + ')'
+        else:
+            s += rstr(self.right)
+        return s
+
+def rsub(self, subs):
+    def _sub(f):
+        if f is None:  return None
+        if f.type is not Fm.VAR:
+            return Fm(f.value, _sub(f.left), _sub(f.right))
+        else:
+            return subs[self.metavars.index(f.value)]
+    return _sub(self.fm)
+
+####################################################################
+
+ivars = Fm.__dict__['vars'].f
+irepr = Fm.__dict__['__repr__'].f
+istr  = Fm.__dict__['__str__'].f
+
+AX2 = Schema(Im(Im(φ, Im(ψ, χ)), Im(Im(φ, ψ), Im(φ, χ))))
+SUBS = (Im(P, No(Q)), No(No(R)), Im(Im(P, Q), R))
+BIG = AX2.sub(SUBS)                 # 37 nodes, depth 6
+
+def tm(name, rec, it, arg, *args):
+    n = 20_000
+    tr = timeit(lambda: rec(arg, *args), number=n)
+    ti = timeit(lambda: it(arg, *args),  number=n)
+    print(f'{tr/n*1e6:7.2f} µs recursive  {ti/n*1e6:7.2f} µs iterative  {name}')
+
+if __name__ == '__main__':
+    tm('vars',      rvars, ivars, BIG)
+    tm('__repr__',  rrepr, irepr, BIG)
+    tm('__str__',   rstr,  istr,  BIG)
+    tm('sub',       rsub,  Schema.sub, AX2, SUBS)
+
+
+''' Python 3.11, formula of 37 nodes, depth 6:
+
+   5.32 µs recursive     2.45 µs iterative  vars
+   7.36 µs recursive     6.92 µs iterative  __repr__
+   9.59 µs recursive     6.65 µs iterative  __str__
+   6.85 µs recursive     4.96 µs iterative  sub
+
+    `vars` gains from collecting into a `dict` rather than searching a
+    string for each variable, `__str__` from joining a single list of
+    pieces rather than building intermediate strings, and `Schema.sub`
+    from caching its post-order traversal of the schema.
+'''